@@ -0,0 +1,147 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404, HttpResponse
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import get_authorization_header
+from rest_framework.exceptions import APIException, AuthenticationFailed
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.views import exception_handler
+
+from .authentication import CachedTokenAuthentication
+from .ingredient_index import ingredient_index
+from .membership import get_membership
+from .middleware import timed
+from .tag_registry import tag_registry
+from .views import IngredientViewSet, RecipeViewSet, TagViewSet
+
+
+async def authenticate(request):
+    '''CachedTokenAuthentication на асинхронном ORM.'''
+    auth = get_authorization_header(request).split()
+    keyword = CachedTokenAuthentication.keyword.lower().encode()
+    if not auth or auth[0].lower() != keyword:
+        return AnonymousUser()
+    if len(auth) == 1:
+        raise AuthenticationFailed(
+            _('Invalid token header. No credentials provided.'))
+    if len(auth) > 2:
+        raise AuthenticationFailed(_('Invalid token header. '
+                                     'Token string should not contain '
+                                     'spaces.'))
+    try:
+        key = auth[1].decode()
+    except UnicodeError:
+        raise AuthenticationFailed(_('Invalid token header. Token string '
+                                     'should not contain invalid '
+                                     'characters.'))
+    user, _token = await (CachedTokenAuthentication()
+                          .aauthenticate_credentials(key))
+    return user
+
+
+def json_response(data, status=200, headers=None):
+    with timed('render'):
+        content = JSONRenderer().render(data)
+    return HttpResponse(content, status=status, headers=headers,
+                        content_type='application/json')
+
+
+def async_read(read, sync_view, delegate=None):
+    '''Асинхронное представление для GET поверх ViewSet.
+
+    Остальные методы и запросы, для которых delegate(request) истинно,
+    обслуживает прежнее представление DRF в потоке. Ответ всегда JSON.
+    '''
+    sync_view = sync_to_async(sync_view)
+
+    async def view(request, *args, **kwargs):
+        if request.method != 'GET' or (delegate and delegate(request)):
+            return await sync_view(request, *args, **kwargs)
+        drf_request = Request(request)
+        try:
+            drf_request.user = await authenticate(request)
+            return json_response(await read(drf_request, **kwargs))
+        except (APIException, Http404) as exc:
+            if isinstance(exc, AuthenticationFailed):
+                exc.auth_header = CachedTokenAuthentication.keyword
+            response = exception_handler(exc, {})
+            del response['Content-Type']
+            return json_response(response.data, response.status_code,
+                                 dict(response.items()))
+
+    view.csrf_exempt = True
+    return view
+
+
+def get_view(viewset, action, request, **kwargs):
+    return viewset(action=action, request=request, args=(), kwargs=kwargs,
+                   format_kwarg=None)
+
+
+async def load_membership(user):
+    '''Избранное, корзина и подписки до сериализации, чтобы
+       сериализаторы не обращались к БД из цикла событий.'''
+    if user.is_authenticated:
+        await sync_to_async(get_membership)(user)
+
+
+async def recipe_list(request):
+    view = get_view(RecipeViewSet, 'list', request)
+    await load_membership(request.user)
+    queryset = await sync_to_async(view.filter_queryset)(view.get_queryset())
+    paginator = view.paginator
+    page = await paginator.apaginate_queryset(queryset, request)
+    return paginator.get_paginated_response(
+        view.get_serializer(page, many=True).data
+    ).data
+
+
+async def recipe_detail(request, pk):
+    view = get_view(RecipeViewSet, 'retrieve', request, pk=pk)
+    await load_membership(request.user)
+    queryset = await sync_to_async(view.filter_queryset)(view.get_queryset())
+    try:
+        recipe = await queryset.aget(pk=pk)
+    except queryset.model.DoesNotExist:
+        raise Http404
+    return view.get_serializer(recipe).data
+
+
+async def ingredient_list(request):
+    view = get_view(IngredientViewSet, 'list', request)
+    name = request.query_params.get('name')
+    if name:
+        limit = settings.INGREDIENT_SEARCH_LIMIT
+        ingredients = ingredient_index.search(name, limit)
+        if ingredients is not None:
+            return ingredients
+        queryset = view.filter_queryset(view.get_queryset())[:limit]
+    else:
+        queryset = view.get_queryset()
+    return view.get_serializer(
+        [ingredient async for ingredient in queryset.aiterator()], many=True
+    ).data
+
+
+async def ingredient_detail(request, pk):
+    view = get_view(IngredientViewSet, 'retrieve', request, pk=pk)
+    try:
+        ingredient = await view.get_queryset().aget(pk=pk)
+    except view.queryset.model.DoesNotExist:
+        raise Http404
+    return view.get_serializer(ingredient).data
+
+
+async def tag_list(request):
+    view = get_view(TagViewSet, 'list', request)
+    return view.get_serializer(await tag_registry.aall(), many=True).data
+
+
+async def tag_detail(request, pk):
+    tag = await tag_registry.aget(pk)
+    if tag is None:
+        raise Http404
+    return get_view(TagViewSet, 'retrieve', request, pk=pk).get_serializer(
+        tag).data
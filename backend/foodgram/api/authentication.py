@@ -0,0 +1,123 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from .metrics import record_cache
+
+
+def token_key(key):
+    return f'auth_token:{key}'
+
+
+def user_key(user_id):
+    return f'auth_token_user:{user_id}'
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    '''TokenAuthentication с токеном и пользователем в кэше Django.
+
+    Запрос Token JOIN User выполняется один раз за TOKEN_CACHE_TTL.
+    В кэше лежат только поля токена и пользователя без хэша пароля.
+    Запись сбрасывается сигналами при удалении токена (выход, админка,
+    ORM) и любом изменении или удалении пользователя; изменения через
+    QuerySet.update() сигналов не вызывают и видны через TOKEN_CACHE_TTL.
+    Сброс виден всем воркерам только в общем кэше, поэтому без REDIS_URL
+    TOKEN_CACHE_TTL равен 0 и токен каждый раз читается из БД.
+    '''
+    def authenticate_credentials(self, key):
+        if not settings.TOKEN_CACHE_TTL:
+            return super().authenticate_credentials(key)
+        entry = cache.get(token_key(key))
+        record_cache('auth_token', entry is not None)
+        if entry is None:
+            user, token = super().authenticate_credentials(key)
+            self.remember(token)
+            return user, token
+        return self.restore(key, entry)
+
+    async def aauthenticate_credentials(self, key):
+        '''Тот же поиск токена на асинхронном ORM.'''
+        if settings.TOKEN_CACHE_TTL:
+            entry = await cache.aget(token_key(key))
+            record_cache('auth_token', entry is not None)
+            if entry is not None:
+                return self.restore(key, entry)
+        model = self.get_model()
+        try:
+            token = await model.objects.select_related('user').aget(key=key)
+        except model.DoesNotExist:
+            raise AuthenticationFailed(_('Invalid token.'))
+        if not token.user.is_active:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        if settings.TOKEN_CACHE_TTL:
+            await cache.aset_many(self.entries(token),
+                                  settings.TOKEN_CACHE_TTL)
+        return token.user, token
+
+    def restore(self, key, entry):
+        '''Token и User из записи кэша. Пароль не загружен: при
+           обращении он читается из БД, а save() пишет только
+           загруженные поля.'''
+        user_model = get_user_model()
+        fields = cached_fields(user_model)
+        user = user_model.from_db(
+            router.db_for_read(user_model), fields,
+            [entry['user'][name] for name in fields]
+        )
+        if not user.is_active:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        token = self.get_model().from_db(
+            router.db_for_read(self.get_model()),
+            ('key', 'user_id', 'created'),
+            (key, user.pk, entry['created'])
+        )
+        token.user = user
+        return user, token
+
+    @classmethod
+    def remember(cls, token):
+        cache.set_many(cls.entries(token), settings.TOKEN_CACHE_TTL)
+
+    @staticmethod
+    def entries(token):
+        user = token.user
+        entry = {
+            'created': token.created,
+            'user': {name: getattr(user, name)
+                     for name in cached_fields(type(user))},
+        }
+        return {token_key(token.key): entry,
+                user_key(token.user_id): token.key}
+
+
+def cached_fields(user_model):
+    '''Поля пользователя в кэше: все, кроме хэша пароля.'''
+    return [field.attname for field in user_model._meta.concrete_fields
+            if field.name != 'password']
+
+
+def forget_user(user_id):
+    '''Удаляет из кэша токен пользователя после коммита.'''
+    def forget():
+        key = cache.get(user_key(user_id))
+        if key is not None:
+            cache.delete_many((token_key(key), user_key(user_id)))
+
+    transaction.on_commit(forget)
+
+
+def token_deleted(sender, instance, **kwargs):
+    '''Выход через djoser, удаление в админке или через ORM.'''
+    keys = (token_key(instance.key), user_key(instance.user_id))
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    '''Смена пароля, деактивация, правка профиля или удаление.'''
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    forget_user(instance.pk)
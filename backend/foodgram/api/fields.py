@@ -0,0 +1,87 @@
+import base64
+import binascii
+import tempfile
+import uuid
+
+from django.conf import settings
+from django.core.files import File
+from PIL import Image
+from rest_framework import serializers
+
+IMAGE_EXTENSIONS = {
+    'JPEG': 'jpg',
+    'PNG': 'png',
+    'GIF': 'gif',
+    'WEBP': 'webp',
+}
+
+
+class StreamingBase64ImageField(serializers.ImageField):
+    '''Изображение в base64 с ограничением размера.
+
+    Размер проверяется до декодирования, строка декодируется
+    частями во временный файл (в памяти остается не больше
+    FILE_UPLOAD_MAX_MEMORY_SIZE, дальше диск), а Pillow читает только
+    заголовок и проверяет структуру файла без загрузки пикселей.
+    '''
+    chunk_size = 64 * 1024
+    default_error_messages = {
+        'invalid': 'Загрузите корректное изображение в формате base64.',
+        'too_large': 'Размер изображения не должен превышать {max_bytes} '
+                     'байт.',
+        'too_many_pixels': 'Изображение не должно быть больше '
+                           '{max_pixels} пикселей.',
+        'unsupported': 'Поддерживаются только изображения JPEG, PNG, '
+                       'GIF и WebP.',
+    }
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str):
+            self.fail('invalid')
+        start = data.find(';base64,')
+        start = 0 if start == -1 else start + len(';base64,')
+        encoded_size = len(data) - start
+        max_bytes = settings.RECIPE_IMAGE_MAX_BYTES
+        if encoded_size // 4 * 3 > max_bytes:
+            self.fail('too_large', max_bytes=max_bytes)
+        upload = File(tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        ))
+        try:
+            self.decode(data, start, upload)
+            extension = self.check_image(upload)
+        except Exception:
+            upload.close()
+            raise
+        upload.name = f'{uuid.uuid4()}.{extension}'
+        return upload
+
+    def decode(self, data, start, upload):
+        '''Декодирует base64 частями, не создавая копию всей строки.'''
+        if (len(data) - start) % 4:
+            self.fail('invalid')
+        try:
+            for offset in range(start, len(data), self.chunk_size):
+                upload.write(base64.b64decode(
+                    data[offset:offset + self.chunk_size], validate=True
+                ))
+        except (binascii.Error, ValueError):
+            self.fail('invalid')
+        upload.seek(0)
+
+    def check_image(self, upload):
+        '''Проверяет формат и размер в пикселях по заголовку файла.'''
+        try:
+            with Image.open(upload) as image:
+                if image.format not in IMAGE_EXTENSIONS:
+                    self.fail('unsupported')
+                width, height = image.size
+                max_pixels = settings.RECIPE_IMAGE_MAX_PIXELS
+                if width * height > max_pixels:
+                    self.fail('too_many_pixels', max_pixels=max_pixels)
+                image.verify()
+                extension = IMAGE_EXTENSIONS[image.format]
+        except (OSError, SyntaxError, Image.DecompressionBombError):
+            self.fail('invalid')
+        upload.seek(0)
+        return extension
@@ -1,23 +1,58 @@
 import django_filters
-from recipe.models import Ingredient, Recipe, Tag
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.db.models.functions import Collate, Lower
+from recipe.models import Ingredient, Recipe
+
+from .recipe_search import search_recipes
+from .tag_registry import tag_registry
+
+
+class CodepointOrder(Collate):
+    '''Сортировка по кодам символов, как у строк Python: COLLATE "C"
+       в PostgreSQL; в SQLite это порядок BINARY по умолчанию.'''
+    def __init__(self, expression):
+        super().__init__(expression, 'C')
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return compiler.compile(self.source_expressions[0])
+
+
+def tag_choices():
+    return tag_registry.slug_choices()
+
+
+class NumberInFilter(django_filters.BaseInFilter,
+                     django_filters.NumberFilter):
+    '''Список чисел через запятую.'''
 
 
 class IngredientFilter(django_filters.FilterSet):
     '''Фильтр для поиска по ингредиентам.'''
-    name = django_filters.CharFilter(lookup_expr='istartswith')
+    name = django_filters.CharFilter(method='filter_name')
 
     class Meta:
         model = Ingredient
         fields = ('name',)
 
+    def filter_name(self, queryset, name, value):
+        '''Порядок как у ingredient_index: строки в нижнем регистре
+           по кодам символов, затем id. Срез INGREDIENT_SEARCH_LIMIT
+           совпадает с результатом индекса при любой сортировке БД.'''
+        return queryset.alias(name_lower=Lower('name')).filter(
+            name_lower__startswith=value.lower()
+        ).order_by(CodepointOrder(Lower('name')), 'id')
+
 
 class RecipeFilter(django_filters.FilterSet):
     '''Фильтр рецептов по тэгам, избранному и
        добавлению в корзину покупок.'''
-    tags = django_filters.ModelMultipleChoiceFilter(
-        queryset=Tag.objects.all(),
-        field_name='tags__slug',
-        to_field_name='slug'
+    search = django_filters.CharFilter(method='filter_search')
+    ingredients = NumberInFilter(method='filter_ingredients')
+    exclude_ingredients = NumberInFilter(method='filter_exclude_ingredients')
+    tags = django_filters.MultipleChoiceFilter(
+        choices=tag_choices,
+        method='filter_tags'
     )
     is_favorited = django_filters.BooleanFilter(
         method='get_is_favorited')
@@ -26,9 +61,24 @@ class RecipeFilter(django_filters.FilterSet):
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags',
+        fields = ('author', 'tags', 'search',
+                  'ingredients', 'exclude_ingredients',
                   'is_favorited', 'is_in_shopping_cart')
 
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def filter_ingredients(self, queryset, name, value):
+        return queryset.cookable_from(value, settings.RECIPE_MIN_COVERAGE)
+
+    def filter_exclude_ingredients(self, queryset, name, value):
+        return queryset.without_ingredients(value)
+
+    def filter_tags(self, queryset, name, value):
+        tags = [tag_registry.get_by_slug(slug) for slug in value]
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe=OuterRef('pk'), tag__in=tags)))
+
     def get_is_favorited(self, name, queryset, value):
         if self.request.user.is_authenticated:
             if value:
@@ -0,0 +1,93 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+from recipe.models import Recipe
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    '''Пул фоновых обработчиков изображений, создается при первом вызове.'''
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.RECIPE_IMAGE_WORKERS,
+            thread_name_prefix='recipe-image'
+        )
+    return _executor
+
+
+def schedule_image_processing(recipe, stale_files=()):
+    '''Ставит обработку изображения рецепта в очередь после коммита.
+
+    stale_files - варианты прежнего изображения, которые нужно удалить.
+    '''
+    recipe_id, image_name = recipe.id, recipe.image.name
+    transaction.on_commit(lambda: get_executor().submit(
+        run_in_background, recipe_id, image_name, stale_files
+    ))
+
+
+def run_in_background(recipe_id, image_name, stale_files=()):
+    try:
+        process_recipe_image(recipe_id, image_name, stale_files)
+    except Exception:
+        logger.exception('Не удалось обработать изображение рецепта %s',
+                         recipe_id)
+    finally:
+        connection.close()
+
+
+def encode_webp(image, size):
+    '''Копия изображения, вписанная в size, в формате WebP.'''
+    image = image.copy()
+    image.thumbnail(size, Image.LANCZOS)
+    buffer = BytesIO()
+    image.save(buffer, format='WEBP', quality=settings.RECIPE_WEBP_QUALITY,
+               method=4)
+    return ContentFile(buffer.getvalue())
+
+
+def process_recipe_image(recipe_id, image_name, stale_files=()):
+    '''Создает миниатюру и WebP-версию изображения рецепта.
+
+    Если за время обработки изображение рецепта заменили,
+    результат отбрасывается: для нового изображения уже стоит своя задача.
+    '''
+    recipe = Recipe.objects.filter(id=recipe_id, image=image_name).first()
+    if recipe is None:
+        return
+    with recipe.image.open('rb') as file:
+        image = Image.open(file)
+        image.draft('RGB', settings.RECIPE_IMAGE_MAX_SIZE)
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands()
+                                  else 'RGB')
+    base_name = os.path.splitext(os.path.basename(image_name))[0]
+    old_files = [recipe.thumbnail.name, recipe.image_webp.name,
+                 *stale_files]
+    recipe.thumbnail.save(
+        f'{base_name}.webp',
+        encode_webp(image, settings.RECIPE_THUMBNAIL_SIZE), save=False
+    )
+    recipe.image_webp.save(
+        f'{base_name}.webp',
+        encode_webp(image, settings.RECIPE_IMAGE_MAX_SIZE), save=False
+    )
+    updated = Recipe.objects.filter(id=recipe_id, image=image_name).update(
+        thumbnail=recipe.thumbnail.name, image_webp=recipe.image_webp.name
+    )
+    if not updated:
+        old_files = [recipe.thumbnail.name, recipe.image_webp.name]
+    for name in set(old_files):
+        if name:
+            recipe.image.storage.delete(name)
@@ -0,0 +1,84 @@
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import connection
+from recipe.models import Ingredient
+
+from .metrics import record_cache
+
+
+class IngredientPrefixIndex:
+    '''Индекс ингредиентов в памяти процесса для поиска по началу названия.
+
+    Строится в фоне при первом обращении, сбрасывается сигналами
+    при изменении ингредиентов и по истечении INGREDIENT_INDEX_TTL,
+    чтобы другие процессы не отдавали устаревшие данные.
+    '''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = None
+        self._rows = None
+        self._built_at = 0
+        self._version = 0
+        self._building = False
+
+    @property
+    def is_warm(self):
+        return (self._keys is not None
+                and time.monotonic() - self._built_at
+                < settings.INGREDIENT_INDEX_TTL)
+
+    def search(self, prefix, limit):
+        '''Ингредиенты, название которых начинается с prefix.
+           None, если индекс еще не построен.'''
+        record_cache('ingredient_index', self.is_warm)
+        if not self.is_warm:
+            self._build_in_background()
+            return None
+        keys, rows = self._keys, self._rows
+        prefix = prefix.lower()
+        start = bisect_left(keys, prefix)
+        result = []
+        for position in range(start, min(start + limit, len(keys))):
+            if not keys[position].startswith(prefix):
+                break
+            result.append(rows[position])
+        return result
+
+    def invalidate(self, **kwargs):
+        with self._lock:
+            self._version += 1
+            self._keys = self._rows = None
+
+    def build(self):
+        with self._lock:
+            version = self._version
+        rows = sorted(
+            Ingredient.objects.values('id', 'name', 'measurement_unit')
+            .iterator(),
+            key=lambda row: (row['name'].lower(), row['id'])
+        )
+        with self._lock:
+            if version == self._version:
+                self._keys = [row['name'].lower() for row in rows]
+                self._rows = rows
+                self._built_at = time.monotonic()
+
+    def _build_in_background(self):
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+        threading.Thread(target=self._safe_build, daemon=True).start()
+
+    def _safe_build(self):
+        try:
+            self.build()
+        finally:
+            self._building = False
+            connection.close()
+
+
+ingredient_index = IngredientPrefixIndex()
@@ -0,0 +1,44 @@
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+@contextmanager
+def test_database(keepdb=False):
+    '''Временная тестовая БД, чтобы замеры не трогали рабочие данные.'''
+    old_name = connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False, keepdb=keepdb
+    )
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0,
+                                            keepdb=keepdb)
+
+
+def measure(func, repeat):
+    '''Вызывает func repeat раз и возвращает время вызовов в секундах.'''
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def summary(timings):
+    '''Медиана и перцентили времени в миллисекундах.'''
+    timings = sorted(timings)
+
+    def percentile(value):
+        return timings[min(len(timings) - 1,
+                           int(len(timings) * value / 100))] * 1000
+
+    return {
+        'min': timings[0] * 1000,
+        'p50': statistics.median(timings) * 1000,
+        'p95': percentile(95),
+        'p99': percentile(99),
+    }
@@ -0,0 +1,223 @@
+import json
+import random
+import statistics
+import sys
+import time
+from contextlib import nullcontext
+
+from api.management.benchmark import summary
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from recipe.models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                           ShoppingListItem, Tag)
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.models import Follow, User
+
+PAGE_SIZE = 6
+
+
+class Workload:
+    '''Случайные, но воспроизводимые параметры запросов по текущей БД.'''
+    def __init__(self, randomizer, users):
+        self.randomizer = randomizer
+        self.users = users
+        self.recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+        self.author_ids = list(Recipe.objects.order_by().values_list(
+            'author', flat=True).distinct())
+        self.tag_slugs = list(Tag.objects.values_list('slug', flat=True))
+        self.ingredients = list(Ingredient.objects.values_list('id', 'name'))
+        self.words = list({
+            word for name in Recipe.objects.values_list('name', flat=True)[
+                :1000]
+            for word in name.split() if word.isalpha()
+        })
+        self.favorites = {
+            user.id: set(Favorite.objects.filter(user=user)
+                         .values_list('recipe', flat=True))
+            for user in users
+        }
+        self.not_favorites = {}
+        if not self.recipe_ids or not self.ingredients:
+            raise CommandError('В БД нет рецептов, запустите generatedata.')
+
+    def user(self):
+        return self.randomizer.choice(self.users)
+
+    def page(self):
+        pages = max(1, len(self.recipe_ids) // PAGE_SIZE)
+        return self.randomizer.randint(1, min(pages, 100))
+
+    def recipe(self):
+        return self.randomizer.choice(self.recipe_ids)
+
+    def author(self):
+        return self.randomizer.choice(self.author_ids)
+
+    def tag(self):
+        return self.randomizer.choice(self.tag_slugs)
+
+    def word(self):
+        return self.randomizer.choice(self.words)
+
+    def prefix(self):
+        return self.randomizer.choice(self.ingredients)[1][:3]
+
+    def available(self):
+        return ','.join(str(ingredient_id) for ingredient_id, _ in
+                        self.randomizer.sample(self.ingredients, 30))
+
+    def not_favorite(self, user):
+        '''Рецепт не из избранного пользователя или None, если в
+           избранном уже все.'''
+        if user.id not in self.not_favorites:
+            self.not_favorites[user.id] = sorted(
+                set(self.recipe_ids) - self.favorites[user.id]
+            )
+        if not self.not_favorites[user.id]:
+            return None
+        return self.randomizer.choice(self.not_favorites[user.id])
+
+
+# Сценарии: (название, функция (workload, user) -> список запросов).
+SCENARIOS = (
+    ('recipes-list', lambda w, u: [
+        ('get', f'/api/recipes/?page={w.page()}&limit={PAGE_SIZE}')]),
+    ('recipes-list-cursor', lambda w, u: [
+        ('get', f'/api/recipes/?pagination=cursor&limit={PAGE_SIZE}')]),
+    ('recipes-list-by-tag', lambda w, u: [
+        ('get', f'/api/recipes/?tags={w.tag()}&limit={PAGE_SIZE}')]),
+    ('recipes-list-by-author', lambda w, u: [
+        ('get', f'/api/recipes/?author={w.author()}&limit={PAGE_SIZE}')]),
+    ('recipes-list-favorited', lambda w, u: [
+        ('get', f'/api/recipes/?is_favorited=1&limit={PAGE_SIZE}')]),
+    ('recipes-list-in-cart', lambda w, u: [
+        ('get', f'/api/recipes/?is_in_shopping_cart=1&limit={PAGE_SIZE}')]),
+    ('recipes-search', lambda w, u: [
+        ('get', f'/api/recipes/?search={w.word()}&limit={PAGE_SIZE}')]),
+    ('recipes-cookable', lambda w, u: [
+        ('get', f'/api/recipes/?ingredients={w.available()}'
+                f'&limit={PAGE_SIZE}')]),
+    ('recipes-detail', lambda w, u: [
+        ('get', f'/api/recipes/{w.recipe()}/')]),
+    ('subscriptions', lambda w, u: [
+        ('get', f'/api/users/subscriptions/?recipes_limit=3'
+                f'&limit={PAGE_SIZE}')]),
+    ('favorite-toggle', lambda w, u: [
+        (method, f'/api/recipes/{recipe_id}/favorite/')
+        for recipe_id in [w.not_favorite(u)] if recipe_id is not None
+        for method in ('post', 'delete')]),
+    ('download-shopping-cart-pdf', lambda w, u: [
+        ('get', '/api/recipes/download_shopping_cart/')]),
+    ('download-shopping-cart-csv', lambda w, u: [
+        ('get', '/api/recipes/download_shopping_cart/?format=csv')]),
+    ('ingredients-search', lambda w, u: [
+        ('get', f'/api/ingredients/?name={w.prefix()}')]),
+    ('tags-list', lambda w, u: [('get', '/api/tags/')]),
+)
+
+
+class Command(BaseCommand):
+    '''Нагрузочный замер эндпоинтов API на данных текущей БД.'''
+    help = ('Вызывает эндпоинты API через тестовый клиент от имени '
+            'случайных пользователей и выводит пропускную способность, '
+            'p50/p95/p99 и число запросов к БД в JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100,
+                            help='Замеров на сценарий.')
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--users', type=int, default=20,
+                            help='Сколько пользователей задействовать.')
+        parser.add_argument('--prefix', default='bench',
+                            help='Префикс пользователей из generatedata.')
+        parser.add_argument('--only', nargs='+', default=None)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--label', default='',
+                            help='Метка результата, например хеш коммита.')
+        parser.add_argument('--output', default='-')
+
+    def handle(self, *args, **options):
+        randomizer = random.Random(options['seed'])
+        users = list(User.objects.filter(
+            username__startswith=options['prefix'],
+            shopping_list__isnull=False,
+        ).distinct().order_by('id')[:options['users']])
+        if not users:
+            raise CommandError('Нет пользователей со списком покупок, '
+                               'запустите generatedata.')
+        workload = Workload(randomizer, users)
+        clients = {}
+        for user in users:
+            clients[user.id] = APIClient()
+            clients[user.id].credentials(
+                HTTP_AUTHORIZATION='Token '
+                f'{Token.objects.get_or_create(user=user)[0].key}'
+            )
+        results = {}
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for name, scenario in SCENARIOS:
+                if options['only'] and name not in options['only']:
+                    continue
+                results[name] = self.run(
+                    scenario, workload, clients, options
+                )
+                if results[name] is None:
+                    self.stderr.write(f'{name:>28}: пропущен, нет данных '
+                                      'для запросов')
+                    continue
+                self.stderr.write(
+                    f'{name:>28}: {results[name]["rps"]:7.1f} rps, '
+                    f'p50 {results[name]["latency_ms"]["p50"]:7.1f} мс, '
+                    f'p99 {results[name]["latency_ms"]["p99"]:7.1f} мс, '
+                    f'запросов {results[name]["queries"]["mean"]:.1f}'
+                )
+        report = {
+            'label': options['label'],
+            'created_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'data': {model._meta.model_name: model.objects.count()
+                     for model in (User, Follow, Recipe, Ingredient,
+                                   Favorite, ShoppingCart,
+                                   ShoppingListItem)},
+            'options': {key: options[key]
+                        for key in ('requests', 'warmup', 'users', 'seed')},
+            'scenarios': results,
+        }
+        with (nullcontext(sys.stdout) if options['output'] == '-'
+              else open(options['output'], 'w')) as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+            output.write('\n')
+
+    def run(self, scenario, workload, clients, options):
+        timings = []
+        queries = []
+        errors = 0
+        for number in range(options['warmup'] + options['requests']):
+            user = workload.user()
+            for method, path in scenario(workload, user):
+                with CaptureQueriesContext(connection) as context:
+                    started = time.perf_counter()
+                    response = getattr(clients[user.id], method)(path)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                    elapsed = time.perf_counter() - started
+                if number < options['warmup']:
+                    continue
+                timings.append(elapsed)
+                queries.append(len(context))
+                errors += response.status_code >= 400
+        if not timings:
+            return None
+        latency = summary(timings)
+        latency['mean'] = statistics.mean(timings) * 1000
+        return {
+            'requests': len(timings),
+            'errors': errors,
+            'rps': len(timings) / sum(timings),
+            'latency_ms': latency,
+            'queries': {'mean': statistics.mean(queries),
+                        'max': max(queries)},
+        }
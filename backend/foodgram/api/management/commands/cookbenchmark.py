@@ -0,0 +1,98 @@
+import random
+
+from api.management.benchmark import measure, summary, test_database
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count, F, FloatField, Q
+from django.db.models.functions import Cast
+from recipe.models import Ingredient, IngredientAmount, Recipe
+from users.models import User
+
+
+def counted(ingredient_ids, min_coverage):
+    '''Покрытие без сохраненного количества ингредиентов: общее число
+       считается по всем строкам IngredientAmount каждого кандидата.'''
+    candidates = IngredientAmount.objects.filter(
+        ingredient__in=ingredient_ids).values('recipe')
+    return Recipe.objects.filter(pk__in=candidates).annotate(
+        ingredients_total=Count('ingredientamount'),
+        ingredients_available=Count(
+            'ingredientamount',
+            filter=Q(ingredientamount__ingredient__in=ingredient_ids)
+        ),
+    ).annotate(
+        coverage=Cast('ingredients_available', FloatField())
+        / F('ingredients_total')
+    ).filter(coverage__gte=min_coverage).order_by(
+        '-coverage', '-ingredients_available', '-pub_date', '-id'
+    )
+
+
+class Command(BaseCommand):
+    '''Поиск рецептов по имеющимся ингредиентам на большом каталоге.'''
+    help = ('Время фильтра ?ingredients= на каталоге рецептов: '
+            'с подсчетом всех ингредиентов кандидатов и с сохраненным '
+            'количеством ингредиентов рецепта.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument('--per-recipe', type=int, default=8)
+        parser.add_argument('--available', nargs='+', type=int,
+                            default=(5, 20, 50))
+        parser.add_argument('--min-coverage', type=float, default=0.5)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with test_database():
+            ingredient_ids = self.seed(options)
+            self.stdout.write(f'{"ингредиентов":>13} {"найдено":>8} '
+                              f'{"подсчет, мс":>12} {"счетчик, мс":>12}')
+            for size in options['available']:
+                available = ingredient_ids[:size]
+                queryset = Recipe.objects.cookable_from(
+                    available, options['min_coverage'])
+                found = queryset.count()
+                baseline = counted(available, options['min_coverage'])
+                self.stdout.write(
+                    f'{size:>13} {found:>8} '
+                    f'{self.time(baseline, options["repeat"]):>12.1f} '
+                    f'{self.time(queryset, options["repeat"]):>12.1f}'
+                )
+
+    def seed(self, options):
+        '''Каталог, где частота ингредиентов убывает, как в жизни.'''
+        randomizer = random.Random(0)
+        author = User.objects.create(username='author',
+                                     email='author@bench.ru')
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'ingredient{i}', measurement_unit='г')
+            for i in range(options['ingredients'])
+        )
+        ingredient_ids = [ingredient.id for ingredient in ingredients]
+        weights = [1 / (rank + 1) for rank in range(len(ingredient_ids))]
+        recipes = Recipe.objects.bulk_create(
+            (Recipe(author=author, name=f'recipe{i}', text='text',
+                    cooking_time=10, image='media/bench.png')
+             for i in range(options['recipes'])),
+            batch_size=5000
+        )
+        IngredientAmount.objects.bulk_create(
+            (IngredientAmount(recipe=recipe, ingredient_id=ingredient_id,
+                              amount=1)
+             for recipe in recipes
+             for ingredient_id in set(randomizer.choices(
+                 ingredient_ids, weights, k=options['per_recipe']))),
+            batch_size=5000
+        )
+        Recipe.objects.refresh_ingredients_count()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        return ingredient_ids
+
+    @staticmethod
+    def time(queryset, repeat):
+        '''Первая страница и общее количество, как в ответе API.'''
+        return summary(measure(
+            lambda: (list(queryset[:6]), queryset.count()), repeat
+        ))['p50']
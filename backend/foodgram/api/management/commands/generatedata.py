@@ -0,0 +1,195 @@
+import random
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate, islice
+
+from api.shopping_list import refresh_shopping_lists
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image
+from recipe.models import (Favorite, Ingredient, IngredientAmount, Recipe,
+                           ShoppingCart, Tag)
+from users.models import Follow, User
+
+PASSWORD = 'Bench-Pa55word'
+IMAGE = 'media/bench.png'
+TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+)
+WORDS = ('суп', 'салат', 'пирог', 'запеканка', 'каша', 'омлет', 'рагу',
+         'паста', 'котлеты', 'блины', 'плов', 'борщ', 'соус', 'десерт')
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class PowerLaw:
+    '''Выбор элементов с вероятностью, убывающей по степенному закону.'''
+    def __init__(self, items, randomizer, exponent=1.0):
+        self.items = items
+        self.randomizer = randomizer
+        self.cum_weights = list(accumulate(
+            1 / (rank + 1) ** exponent for rank in range(len(items))
+        ))
+
+    def choice(self):
+        return self.sample(1).pop()
+
+    def sample(self, count):
+        '''Не более count разных элементов.'''
+        return set(self.randomizer.choices(
+            self.items, cum_weights=self.cum_weights, k=count
+        ))
+
+    def degree(self, mean, maximum):
+        '''Случайная степень с тяжелым хвостом и средним около mean.'''
+        return min(maximum, int(self.randomizer.paretovariate(2) * mean / 2))
+
+
+class Command(BaseCommand):
+    '''Генерация реалистичного объема данных для нагрузочных замеров.'''
+    help = ('Создает пользователей, подписки со степенным распределением, '
+            'рецепты из ingredients.csv, избранное и корзины. '
+            f'Пароль всех пользователей: {PASSWORD}')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--follows', type=int, default=20,
+                            help='Среднее число подписок пользователя.')
+        parser.add_argument('--favorites', type=int, default=30,
+                            help='Среднее число рецептов в избранном.')
+        parser.add_argument('--carts', type=int, default=5,
+                            help='Среднее число рецептов в корзине.')
+        parser.add_argument('--prefix', default='bench')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.randomizer = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        call_command('csvimport', verbosity=0, stdout=self.stdout)
+        self.create_image()
+        tags = [Tag.objects.get_or_create(
+            slug=slug, defaults={'name': name, 'color': color})[0]
+            for name, color, slug in TAGS]
+        with transaction.atomic():
+            users = self.create_users(options['users'], options['prefix'])
+            self.create_follows(users, options['follows'])
+            recipes = self.create_recipes(users, tags, options['recipes'])
+            self.create_memberships(Favorite, users, recipes,
+                                    options['favorites'])
+            self.create_memberships(ShoppingCart, users, recipes,
+                                    options['carts'])
+        for user_ids in batched((user.id for user in users), 100):
+            refresh_shopping_lists(user_ids)
+        self.log('списки покупок пересчитаны')
+        return (f'Создано пользователей: {len(users)}, '
+                f'рецептов: {len(recipes)}.')
+
+    def log(self, message):
+        self.stderr.write(f'{timezone.now():%H:%M:%S} {message}')
+
+    def create_image(self):
+        '''Общая картинка рецептов: ссылки на нее отдаются в ответах
+           и должны открываться.'''
+        if default_storage.exists(IMAGE):
+            return
+        buffer = BytesIO()
+        Image.new('RGB', (64, 64), '#E26C2D').save(buffer, format='PNG')
+        default_storage.save(IMAGE, ContentFile(buffer.getvalue()))
+
+    def create_users(self, count, prefix):
+        password = make_password(PASSWORD)
+        start = User.objects.filter(username__startswith=prefix).count()
+        users = User.objects.bulk_create(
+            (User(username=f'{prefix}{number}',
+                  email=f'{prefix}{number}@bench.ru',
+                  first_name='Тест', last_name=f'Пользователь {number}',
+                  password=password)
+             for number in range(start, start + count)),
+            batch_size=self.batch_size
+        )
+        self.log(f'пользователей: {len(users)}')
+        return users
+
+    def create_follows(self, users, mean):
+        '''Немногие авторы собирают большинство подписчиков.'''
+        authors = PowerLaw(users, self.randomizer)
+        follows = (
+            Follow(user=user, author=author)
+            for user in users
+            for author in authors.sample(authors.degree(mean, len(users)))
+            if author != user
+        )
+        for batch in batched(follows, self.batch_size):
+            Follow.objects.bulk_create(batch, ignore_conflicts=True)
+        self.log('подписки созданы')
+
+    def create_recipes(self, users, tags, count):
+        randomizer = self.randomizer
+        authors = PowerLaw(users, randomizer, exponent=0.8)
+        ingredient_ids = list(Ingredient.objects.values_list('id',
+                                                             flat=True))
+        now = timezone.now()
+        recipes = []
+        for batch in batched(range(count), self.batch_size):
+            created = Recipe.objects.bulk_create(
+                Recipe(author=authors.choice(),
+                       name=(f'{randomizer.choice(WORDS).capitalize()} '
+                             f'{randomizer.choice(WORDS)} №{number}'),
+                       text=' '.join(randomizer.choices(WORDS, k=40)),
+                       cooking_time=randomizer.randint(5, 180),
+                       image=IMAGE)
+                for number in batch
+            )
+            ingredients = {}
+            for recipe in created:
+                recipe.pub_date = now - timedelta(
+                    minutes=randomizer.randint(0, 365 * 24 * 60))
+                ingredients[recipe] = randomizer.sample(
+                    ingredient_ids, randomizer.randint(5, 30))
+                recipe.ingredients_count = len(ingredients[recipe])
+            Recipe.objects.bulk_update(created,
+                                       ('pub_date', 'ingredients_count'))
+            Recipe.tags.through.objects.bulk_create(
+                Recipe.tags.through(recipe=recipe, tag=tag)
+                for recipe in created
+                for tag in randomizer.sample(tags, randomizer.randint(1, 2))
+            )
+            IngredientAmount.objects.bulk_create(
+                (IngredientAmount(recipe=recipe, ingredient_id=ingredient_id,
+                                  amount=randomizer.randint(1, 500))
+                 for recipe in created
+                 for ingredient_id in ingredients[recipe]),
+                batch_size=self.batch_size
+            )
+            if connection.vendor == 'postgresql':
+                Recipe.objects.filter(
+                    pk__in=[recipe.pk for recipe in created]
+                ).update_search_vector()
+            recipes.extend(created)
+        self.log(f'рецептов: {len(recipes)}')
+        return recipes
+
+    def create_memberships(self, model, users, recipes, mean):
+        '''Популярные рецепты попадают в избранное и корзины чаще.'''
+        popular = PowerLaw(recipes, self.randomizer)
+        rows = (
+            model(user=user, recipe=recipe)
+            for user in users
+            for recipe in popular.sample(popular.degree(mean, len(recipes)))
+        )
+        for batch in batched(rows, self.batch_size):
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+        self.log(f'{model._meta.verbose_name_plural}: созданы')
@@ -0,0 +1,126 @@
+from contextlib import contextmanager
+
+from api.management.benchmark import measure, summary, test_database
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models.functions import Lower
+from recipe.models import (Favorite, Ingredient, IngredientAmount, Recipe,
+                           ShoppingCart)
+from users.models import User
+
+
+def cases(user, recipe):
+    '''Запросы горячих путей и индексы, которые их обслуживают.'''
+    return (
+        ('ingredient-prefix', Ingredient, 'ingredient_name_lower_idx',
+         lambda: Ingredient.objects.alias(name_lower=Lower('name')).filter(
+             name_lower__startswith='ингредиент 12')[:50]),
+        ('favorite-lookup', Favorite, 'unique_favorite',
+         lambda: Favorite.objects.filter(user=user, recipe=recipe)[:1]),
+        ('cart-lookup', ShoppingCart, 'unique_shopping_cart',
+         lambda: ShoppingCart.objects.filter(user=user, recipe=recipe)[:1]),
+        ('recipe-feed', Recipe, 'recipe_pub_date_id_idx',
+         lambda: Recipe.objects.order_by('-pub_date', '-id')[:6]),
+        ('ingredientamount-order', Recipe, 'recipe_name_idx',
+         lambda: IngredientAmount.objects.all()[:50]),
+        ('ingredientamount-recipe', IngredientAmount,
+         'ingredientamount_recipe_idx',
+         lambda: IngredientAmount.objects.filter(
+             recipe=recipe, ingredient_id__in=range(1, 50))),
+    )
+
+
+@contextmanager
+def dropped(model, name):
+    '''Временно удаляет индекс или ограничение модели с именем name.'''
+    for index in model._meta.indexes:
+        if index.name == name:
+            remove, add, item = 'remove_index', 'add_index', index
+    for constraint in model._meta.constraints:
+        if constraint.name == name:
+            remove, add, item = ('remove_constraint', 'add_constraint',
+                                 constraint)
+    with connection.schema_editor() as editor:
+        getattr(editor, remove)(model, item)
+    try:
+        yield
+    finally:
+        with connection.schema_editor() as editor:
+            getattr(editor, add)(model, item)
+
+
+class Command(BaseCommand):
+    '''Планы и время запросов горячих путей без индексов и с ними.'''
+    help = ('Печатает EXPLAIN и время запросов до и после '
+            'создания индексов на временной БД.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=20000)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--only', nargs='+', default=None)
+        parser.add_argument('--analyze', action='store_true',
+                            help='EXPLAIN ANALYZE (только PostgreSQL).')
+
+    def handle(self, *args, **options):
+        explain = {'analyze': True} if options['analyze'] else {}
+        with test_database():
+            user, recipe = self.seed(options['recipes'])
+            for name, model, index_name, queryset in cases(user, recipe):
+                if options['only'] and name not in options['only']:
+                    continue
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    f'{name} ({index_name})'
+                ))
+                with_index = self.run(queryset, options['repeat'], explain)
+                with dropped(model, index_name):
+                    without_index = self.run(queryset, options['repeat'],
+                                             explain)
+                for label, (plan, timings) in (('до', without_index),
+                                               ('после', with_index)):
+                    self.stdout.write(
+                        f'{label}: p50 {timings["p50"]:.2f} мс, '
+                        f'p95 {timings["p95"]:.2f} мс\n{plan}'
+                    )
+
+    def seed(self, size):
+        users = User.objects.bulk_create(
+            User(username=f'user{i}', email=f'user{i}@bench.ru')
+            for i in range(100)
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {i}', measurement_unit='г')
+            for i in range(size)
+        )
+        recipes = Recipe.objects.bulk_create(
+            (Recipe(author=users[i % len(users)], name=f'recipe{i}',
+                    text='text', cooking_time=10, image='media/bench.png')
+             for i in range(size)),
+            batch_size=1000
+        )
+        IngredientAmount.objects.bulk_create(
+            (IngredientAmount(recipe=recipe,
+                              ingredient=ingredients[(i * 7 + j) % size],
+                              amount=1)
+             for i, recipe in enumerate(recipes) for j in range(5)),
+            batch_size=1000
+        )
+        for model in (Favorite, ShoppingCart):
+            model.objects.bulk_create(
+                (model(user=user, recipe=recipes[(i * 31 + j) % size])
+                 for i, user in enumerate(users) for j in range(size // 50)),
+                batch_size=1000
+            )
+        self.analyze()
+        return users[-1], recipes[-1]
+
+    def run(self, queryset, repeat, explain):
+        self.analyze()
+        plan = queryset().explain(**explain)
+        timings = measure(lambda: list(queryset()), repeat)
+        return plan, summary(timings)
+
+    @staticmethod
+    def analyze():
+        '''Обновляет статистику планировщика.'''
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
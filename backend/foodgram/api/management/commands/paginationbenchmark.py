@@ -0,0 +1,75 @@
+from api.management.benchmark import measure, summary, test_database
+from api.pagination import RecipeCursorPagination
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from recipe.models import Recipe
+from rest_framework.pagination import Cursor
+from rest_framework.test import APIClient
+from users.models import User
+
+
+class Command(BaseCommand):
+    '''Сравнение постраничного вывода рецептов по номеру страницы
+       и по курсору на глубоких страницах.'''
+    help = 'Время ответа /api/recipes/ на глубоких страницах.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=20000)
+        parser.add_argument('--limit', type=int, default=6)
+        parser.add_argument('--pages', nargs='+', type=int,
+                            default=(1, 10, 100, 1000, 3000))
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        with test_database(), override_settings(ALLOWED_HOSTS=['testserver']):
+            with transaction.atomic():
+                self.seed(options['recipes'])
+                self.run(options)
+                transaction.set_rollback(True)
+
+    def seed(self, size):
+        authors = User.objects.bulk_create(
+            User(username=f'author{i}', email=f'author{i}@bench.ru')
+            for i in range(100)
+        )
+        Recipe.objects.bulk_create(
+            (Recipe(author=authors[i % len(authors)], name=f'recipe{i}',
+                    text='text', cooking_time=10, image='media/bench.png')
+             for i in range(size)),
+            batch_size=1000
+        )
+
+    def run(self, options):
+        client = APIClient()
+        limit = options['limit']
+        ordered = Recipe.objects.order_by('-pub_date', '-id')
+        self.stdout.write(f'{"страница":>9} {"номер, мс":>12} '
+                          f'{"курсор, мс":>12}')
+        for page in options['pages']:
+            if (page - 1) * limit >= options['recipes']:
+                continue
+            page_url = f'/api/recipes/?page={page}&limit={limit}'
+            cursor_url = f'/api/recipes/?limit={limit}&pagination=cursor'
+            if page > 1:
+                previous = ordered[(page - 1) * limit - 1]
+                cursor_url = self.cursor_url(previous, cursor_url)
+            results = [
+                summary(measure(lambda url=url: client.get(url),
+                                options['repeat']))['p50']
+                for url in (page_url, cursor_url)
+            ]
+            self.stdout.write(f'{page:>9} {results[0]:>12.1f} '
+                              f'{results[1]:>12.1f}')
+
+    @staticmethod
+    def cursor_url(previous, url):
+        '''Ссылка на страницу, следующую за рецептом previous.'''
+        paginator = RecipeCursorPagination()
+        paginator.base_url = url
+        position = paginator._get_position_from_instance(
+            previous, paginator.ordering
+        )
+        return paginator.encode_cursor(
+            Cursor(offset=0, reverse=False, position=position)
+        )
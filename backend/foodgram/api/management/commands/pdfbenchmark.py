@@ -0,0 +1,42 @@
+import time
+from io import BytesIO
+
+from api.utils import create_pdf, register_font
+from django.core.management.base import BaseCommand
+
+
+def fake_cart(size):
+    '''Агрегированный список покупок заданного размера.'''
+    return [
+        {'ingredient__name': f'Ингредиент номер {i} ' * (1 + i % 4),
+         'ingredient__measurement_unit': 'г',
+         'ingredient_amount': i % 5000 + 1}
+        for i in range(size)
+    ]
+
+
+class Command(BaseCommand):
+    '''Замер скорости генерации PDF со списком покупок.'''
+    help = 'Время генерации PDF для корзин разного размера.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int,
+                            default=(10, 100, 1000))
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        register_font()
+        for size in options['sizes']:
+            cart = fake_cart(size)
+            timings = []
+            for _ in range(options['repeat']):
+                output = BytesIO()
+                started = time.perf_counter()
+                create_pdf(cart, output)
+                timings.append(time.perf_counter() - started)
+            self.stdout.write(
+                f'{size:>6} ингредиентов: '
+                f'{min(timings) * 1000:8.1f} мс (мин), '
+                f'{sum(timings) / len(timings) * 1000:8.1f} мс (сред), '
+                f'{len(output.getvalue()) // 1024} КБ'
+            )
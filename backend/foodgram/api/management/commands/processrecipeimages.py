@@ -0,0 +1,29 @@
+from api.images import process_recipe_image
+from django.core.management.base import BaseCommand
+from recipe.models import Recipe
+
+
+class Command(BaseCommand):
+    '''Создание миниатюр и WebP-версий для уже загруженных рецептов.'''
+    help = 'Обрабатывает изображения рецептов без миниатюр.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Пересоздать варианты для всех рецептов.')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(thumbnail='')
+        processed = 0
+        for recipe_id, image_name in recipes.values_list(
+                'id', 'image').iterator():
+            try:
+                process_recipe_image(recipe_id, image_name)
+            except (OSError, ValueError) as error:
+                self.stderr.write(f'Рецепт {recipe_id}: {error}')
+                continue
+            processed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {processed}'
+        ))
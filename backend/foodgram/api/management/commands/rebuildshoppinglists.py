@@ -0,0 +1,64 @@
+from api.shopping_list import cart_totals, refresh_shopping_lists
+from django.core.management.base import BaseCommand, CommandError
+from recipe.models import ShoppingCart, ShoppingListItem
+
+
+class Command(BaseCommand):
+    '''Пересборка таблицы сумм списков покупок и проверка расхождений.'''
+    help = ('Пересчитывает списки покупок по корзинам. С --check только '
+            'сообщает о расхождениях.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Только проверить, ничего не меняя.')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Сколько пользователей обрабатывать '
+                                 'за раз.')
+
+    def handle(self, *args, **options):
+        user_ids = sorted(
+            set(ShoppingCart.objects.values_list('user', flat=True)
+                .distinct().iterator())
+            | set(ShoppingListItem.objects.values_list('user', flat=True)
+                  .distinct().iterator())
+        )
+        batch_size = options['batch_size']
+        drift = 0
+        for start in range(0, len(user_ids), batch_size):
+            batch = user_ids[start:start + batch_size]
+            if options['check']:
+                drift += self.count_drift(batch)
+            else:
+                refresh_shopping_lists(batch)
+        if options['check']:
+            if drift:
+                raise CommandError(
+                    f'Расхождений в списках покупок: {drift}'
+                )
+            self.stdout.write(self.style.SUCCESS(
+                'Списки покупок совпадают с корзинами.'
+            ))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок пересчитаны для {len(user_ids)} '
+            'пользователей.'
+        ))
+
+    def count_drift(self, user_ids):
+        expected = cart_totals(user_ids)
+        actual = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount
+            in ShoppingListItem.objects.filter(user__in=user_ids)
+            .values_list('user', 'ingredient', 'amount')
+        }
+        drift = 0
+        for key in expected.keys() | actual.keys():
+            if expected.get(key) != actual.get(key):
+                drift += 1
+                self.stdout.write(
+                    f'user={key[0]} ingredient={key[1]}: '
+                    f'ожидалось {expected.get(key)}, '
+                    f'в таблице {actual.get(key)}'
+                )
+        return drift
@@ -0,0 +1,196 @@
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+from api.management.benchmark import summary
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+HOST = '127.0.0.1'
+WORKER_CLASSES = {
+    'wsgi': 'sync',
+    'asgi': 'uvicorn.workers.UvicornWorker',
+}
+
+
+@contextmanager
+def server(interface, workers, port, timeout=30):
+    '''gunicorn с приложением foodgram.<interface> на время замера.'''
+    process = subprocess.Popen(
+        ('gunicorn', f'foodgram.{interface}:application',
+         '--workers', str(workers),
+         '--worker-class', WORKER_CLASSES[interface],
+         '--bind', f'{HOST}:{port}', '--log-level', 'warning'),
+        cwd=settings.BASE_DIR,
+        env={**os.environ, 'SERVER_INTERFACE': interface,
+             'REQUEST_LOG_LEVEL': 'WARNING'},
+    )
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                socket.create_connection((HOST, port), timeout=1).close()
+                break
+            except OSError:
+                if (process.poll() is not None
+                        or time.monotonic() > deadline):
+                    raise CommandError(f'Сервер {interface} не запустился.')
+                time.sleep(0.2)
+        yield
+    finally:
+        process.terminate()
+        process.wait()
+
+
+async def get(port, path, headers, delay=0):
+    '''GET-запрос; при delay заголовки отправляются по одному
+       с паузой, как у медленного мобильного клиента.'''
+    reader, writer = await asyncio.open_connection(HOST, port)
+    try:
+        lines = [f'GET {path} HTTP/1.1', f'Host: {HOST}',
+                 'Connection: close', *headers]
+        if delay:
+            for line in lines:
+                writer.write(f'{line}\r\n'.encode())
+                await writer.drain()
+                await asyncio.sleep(delay)
+            writer.write(b'\r\n')
+        else:
+            writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode())
+        await writer.drain()
+        status = int((await reader.readline()).split()[1])
+        await reader.read()
+        return status
+    finally:
+        writer.close()
+
+
+class Load:
+    '''Медленные клиенты занимают соединения, быстрые измеряются.'''
+    def __init__(self, port, path, headers, options):
+        self.port = port
+        self.path = path
+        self.headers = headers
+        self.options = options
+        self.timings = []
+        self.errors = 0
+        self.timeouts = 0
+        self.slow_completed = 0
+
+    async def slow_client(self, deadline):
+        while time.monotonic() < deadline:
+            try:
+                await get(self.port, self.path, self.headers,
+                          delay=self.options['slow_delay'])
+                self.slow_completed += 1
+            except OSError:
+                await asyncio.sleep(0.1)
+
+    async def fast_client(self, deadline):
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                status = await asyncio.wait_for(
+                    get(self.port, self.path, self.headers),
+                    self.options['timeout']
+                )
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                continue
+            except OSError:
+                self.errors += 1
+                continue
+            self.timings.append(time.perf_counter() - started)
+            self.errors += status >= 400
+
+    async def run(self):
+        options = self.options
+        deadline = (time.monotonic() + options['slow_delay']
+                    + options['duration'])
+        slow = [asyncio.create_task(self.slow_client(deadline))
+                for _ in range(options['slow_clients'])]
+        await asyncio.sleep(options['slow_delay'])
+        started = time.perf_counter()
+        await asyncio.gather(*(self.fast_client(deadline)
+                               for _ in range(options['fast_clients'])))
+        elapsed = time.perf_counter() - started
+        for task in slow:
+            task.cancel()
+        await asyncio.gather(*slow, return_exceptions=True)
+        result = {
+            'requests': len(self.timings),
+            'errors': self.errors,
+            'timeouts': self.timeouts,
+            'rps': len(self.timings) / elapsed,
+            'slow_completed': self.slow_completed,
+        }
+        if self.timings:
+            result['latency_ms'] = summary(self.timings)
+            result['latency_ms']['mean'] = (
+                statistics.mean(self.timings) * 1000
+            )
+        return result
+
+
+class Command(BaseCommand):
+    '''Сравнение sync gunicorn и ASGI под нагрузкой медленных клиентов.'''
+    help = ('Поочередно запускает gunicorn с sync-воркерами (WSGI) и '
+            'с воркерами uvicorn (ASGI и асинхронное чтение), держит '
+            'открытыми соединения медленных клиентов и измеряет '
+            'задержку и пропускную способность быстрых. Сервер '
+            'вызывается напрямую, без буферизации nginx.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interfaces', nargs='+',
+                            choices=WORKER_CLASSES,
+                            default=list(WORKER_CLASSES))
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--path', default='/api/recipes/?limit=6')
+        parser.add_argument('--token', default=None,
+                            help='Токен для заголовка Authorization.')
+        parser.add_argument('--duration', type=float, default=10,
+                            help='Длительность замера, секунд.')
+        parser.add_argument('--slow-clients', type=int, default=20)
+        parser.add_argument('--slow-delay', type=float, default=1,
+                            help='Пауза между строками заголовков '
+                                 'медленного клиента, секунд.')
+        parser.add_argument('--fast-clients', type=int, default=10)
+        parser.add_argument('--timeout', type=float, default=10,
+                            help='Тайм-аут запроса быстрого клиента.')
+        parser.add_argument('--output', default='-')
+
+    def handle(self, *args, **options):
+        headers = ([f'Authorization: Token {options["token"]}']
+                   if options['token'] else [])
+        results = {}
+        for interface in options['interfaces']:
+            with server(interface, options['workers'], options['port']):
+                results[interface] = asyncio.run(Load(
+                    options['port'], options['path'], headers, options
+                ).run())
+            result = results[interface]
+            self.stderr.write(
+                f'{interface}: {result["rps"]:7.1f} rps, '
+                f'p50 {result.get("latency_ms", {}).get("p50", 0):7.1f} '
+                f'мс, p99 '
+                f'{result.get("latency_ms", {}).get("p99", 0):7.1f} мс, '
+                f'тайм-аутов {result["timeouts"]}, '
+                f'ошибок {result["errors"]}'
+            )
+        report = {
+            'options': {key: options[key] for key in (
+                'workers', 'path', 'duration', 'slow_clients',
+                'slow_delay', 'fast_clients', 'timeout')},
+            'interfaces': results,
+        }
+        with (nullcontext(sys.stdout) if options['output'] == '-'
+              else open(options['output'], 'w')) as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+            output.write('\n')
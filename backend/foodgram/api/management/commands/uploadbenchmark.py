@@ -0,0 +1,49 @@
+import base64
+import os
+import time
+import tracemalloc
+from io import BytesIO
+
+from api.fields import StreamingBase64ImageField
+from django.core.management.base import BaseCommand
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
+
+
+def fake_upload(megabytes):
+    '''PNG из случайного шума размером около megabytes МБ в base64.'''
+    side = int((megabytes * 1024 * 1024 / 3) ** 0.5)
+    image = Image.frombytes('RGB', (side, side), os.urandom(side * side * 3))
+    output = BytesIO()
+    image.save(output, 'PNG', compress_level=0)
+    return ('data:image/png;base64,'
+            + base64.b64encode(output.getvalue()).decode())
+
+
+class Command(BaseCommand):
+    '''Сравнение пикового расхода памяти при декодировании изображений.'''
+    help = ('Пиковая память и время декодирования base64-изображения '
+            'старым и потоковым полем.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--megabytes', type=int, default=8)
+
+    def handle(self, *args, **options):
+        data = fake_upload(options['megabytes'])
+        self.stdout.write(
+            f'Размер строки base64: {len(data) // 1024} КБ'
+        )
+        for name, field in (('Base64ImageField', Base64ImageField()),
+                            ('StreamingBase64ImageField',
+                             StreamingBase64ImageField())):
+            tracemalloc.start()
+            started = time.perf_counter()
+            upload = field.to_internal_value(data)
+            elapsed = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            upload.close()
+            self.stdout.write(
+                f'{name:>26}: {peak // 1024:8} КБ (пик), '
+                f'{elapsed * 1000:8.1f} мс'
+            )
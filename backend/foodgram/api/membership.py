@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from recipe.models import Favorite, ShoppingCart
+from users.models import Follow
+
+from .metrics import record_cache
+
+# Набор id для каждой связи пользователя: модель и поле с id.
+MEMBERSHIP = {
+    'favorites': (Favorite, 'recipe_id'),
+    'shopping_cart': (ShoppingCart, 'recipe_id'),
+    'follows': (Follow, 'author_id'),
+}
+SENDERS = {model: (name, field)
+           for name, (model, field) in MEMBERSHIP.items()}
+
+
+def cache_key(user_id):
+    return f'membership:{user_id}'
+
+
+def get_membership(user):
+    '''Id рецептов в избранном и корзине и id авторов в подписках.
+
+    Читается из кэша Django один раз за запрос, при промахе
+    собирается тремя запросами. None для анонимного пользователя.
+    '''
+    if not user.is_authenticated:
+        return None
+    if not hasattr(user, '_membership'):
+        membership = cache.get(cache_key(user.id))
+        record_cache('membership', membership is not None)
+        if membership is None:
+            membership = {
+                name: set(model.objects.filter(user=user)
+                          .values_list(field, flat=True))
+                for name, (model, field) in MEMBERSHIP.items()
+            }
+            cache.set(cache_key(user.id), membership,
+                      settings.MEMBERSHIP_CACHE_TTL)
+        user._membership = membership
+    return user._membership
+
+
+def is_member(user, name, value):
+    membership = get_membership(user)
+    return membership is not None and value in membership[name]
+
+
+def forget_membership(user_id):
+    '''Удаляет наборы пользователя из кэша после коммита.
+
+    Ключ удаляется, а не правится на месте: чтение, изменение и запись
+    из разных воркеров не атомарны и теряли бы параллельные изменения.
+    Следующий запрос пользователя соберет наборы заново.
+    '''
+    transaction.on_commit(lambda: cache.delete(cache_key(user_id)))
+
+
+def membership_saved(sender, instance, created, **kwargs):
+    if created:
+        forget_membership(instance.user_id)
+
+
+def membership_deleted(sender, instance, **kwargs):
+    forget_membership(instance.user_id)
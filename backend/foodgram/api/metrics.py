@@ -0,0 +1,75 @@
+import hmac
+import os
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+
+QUERY_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+
+REQUESTS = Counter(
+    'foodgram_requests', 'Обработанные запросы.',
+    ('view', 'method', 'status'),
+)
+REQUEST_LATENCY = Histogram(
+    'foodgram_request_duration_seconds', 'Время обработки запроса.',
+    ('view', 'method'),
+)
+REQUEST_QUERIES = Histogram(
+    'foodgram_request_db_queries', 'Число SQL-запросов на запрос.',
+    ('view', 'method'), buckets=QUERY_BUCKETS,
+)
+PDF_RENDER = Histogram(
+    'foodgram_pdf_render_seconds', 'Время формирования PDF списка покупок.',
+)
+CACHE_REQUESTS = Counter(
+    'foodgram_cache_requests', 'Обращения к кэшам: попадания и промахи.',
+    ('cache', 'result'),
+)
+
+
+def observe_request(data):
+    '''Метрики по итогу RequestStats.report.'''
+    view = data['view'] or 'unmatched'
+    method = data['method']
+    REQUESTS.labels(view, method, data['status']).inc()
+    REQUEST_LATENCY.labels(view, method).observe(data['total_ms'] / 1000)
+    REQUEST_QUERIES.labels(view, method).observe(data['db_queries'])
+    if 'pdf_ms' in data:
+        PDF_RENDER.observe(data['pdf_ms'] / 1000)
+
+
+def record_cache(name, hit):
+    CACHE_REQUESTS.labels(name, 'hit' if hit else 'miss').inc()
+
+
+def metrics(request):
+    '''Метрики в текстовом формате Prometheus.
+
+    Под gunicorn значения собираются со всех воркеров из каталога
+    PROMETHEUS_MULTIPROC_DIR. Доступ по заголовку
+    Authorization: Bearer <METRICS_TOKEN>; без токена в настройках
+    адрес не существует.
+    '''
+    if not settings.METRICS_TOKEN:
+        raise Http404
+    if not authorized(request):
+        response = HttpResponse(status=401)
+        response['WWW-Authenticate'] = 'Bearer realm="metrics"'
+        return response
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry),
+                        content_type=CONTENT_TYPE_LATEST)
+
+
+def authorized(request):
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    return scheme.lower() == 'bearer' and hmac.compare_digest(
+        token.encode(), settings.METRICS_TOKEN.encode()
+    )
@@ -0,0 +1,372 @@
+import cProfile
+import io
+import json
+import logging
+import marshal
+import os
+import pstats
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from importlib import import_module
+from types import SimpleNamespace
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject, empty
+from rest_framework.exceptions import AuthenticationFailed
+
+from .authentication import CachedTokenAuthentication
+from .metrics import observe_request
+
+logger = logging.getLogger(__name__)
+
+current_stats = ContextVar('request_stats', default=None)
+
+SQL_PREVIEW_LENGTH = 300
+
+
+class RequestStats:
+    '''Замеры одного запроса: SQL и время этапов обработки.'''
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []
+        self.timings = Counter()
+        self.depth = Counter()
+
+    def record(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, params,
+                                 time.perf_counter() - started))
+
+    @contextmanager
+    def timer(self, name):
+        '''Вложенные замеры одного этапа считаются один раз.'''
+        self.depth[name] += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.depth[name] -= 1
+            if not self.depth[name]:
+                self.timings[name] += time.perf_counter() - started
+
+    def duplicates(self):
+        '''Одинаковые запросы с одинаковыми параметрами.'''
+        counts = Counter((sql, repr(params))
+                         for sql, params, _ in self.queries)
+        return {key: count for key, count in counts.items() if count > 1}
+
+    def report(self, request, response, full=False):
+        total = time.perf_counter() - self.started
+        duplicates = self.duplicates()
+        slowest = max(self.queries, key=lambda query: query[2],
+                      default=None)
+        match = request.resolver_match
+        data = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'db_queries': len(self.queries),
+            'db_ms': round(sum(query[2] for query in self.queries)
+                           * 1000, 1),
+            'db_duplicates': sum(count - 1
+                                 for count in duplicates.values()),
+            **{f'{name}_ms': round(duration * 1000, 1)
+               for name, duration in self.timings.items()},
+        }
+        if slowest is not None:
+            data['slowest_query'] = {
+                'sql': (slowest[0] if full
+                        else slowest[0][:SQL_PREVIEW_LENGTH]),
+                'ms': round(slowest[2] * 1000, 1),
+            }
+        if full:
+            # Только текст SQL: в параметрах бывают хэши паролей,
+            # ключи токенов и персональные данные.
+            data['queries'] = [
+                {'sql': sql, 'ms': round(duration * 1000, 2)}
+                for sql, _, duration in self.queries
+            ]
+            data['duplicates'] = [
+                {'sql': sql, 'count': count}
+                for (sql, _), count in duplicates.items()
+            ]
+        return data
+
+
+def record_query(execute, sql, params, many, context):
+    '''Обертка запросов подключения: пишет SQL в замеры текущего запроса.
+
+    Переменная контекста доступна и в потоках sync_to_async, поэтому
+    учитываются запросы асинхронного ORM.
+    '''
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats.record(execute, sql, params, many, context)
+
+
+def install_sql_recorder(connection, **kwargs):
+    '''Обработчик connection_created: обертка ставится один раз
+       на объект подключения и переживает переподключения.'''
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def timed(name):
+    '''Замер этапа текущего запроса; вне запроса ничего не делает.'''
+    stats = current_stats.get()
+    if stats is None:
+        yield
+        return
+    with stats.timer(name):
+        yield
+
+
+class TimedSerializerMixin:
+    '''Замер сериализации ответа для Server-Timing; вложенные
+       сериализаторы и элементы списка входят в один этап.'''
+    def to_representation(self, instance):
+        with timed('serialize'):
+            return super().to_representation(instance)
+
+
+def server_timing(data):
+    metrics = [f'db;dur={data["db_ms"]};desc="{data["db_queries"]} '
+               f'queries, {data["db_duplicates"]} duplicated"']
+    metrics.extend(
+        f'{key[:-3]};dur={value}' for key, value in data.items()
+        if key.endswith('_ms') and key not in ('db_ms', 'total_ms')
+    )
+    metrics.append(f'total;dur={data["total_ms"]}')
+    return ', '.join(metrics)
+
+
+def timing_visible(request):
+    '''Server-Timing раскрывает число и время SQL: только в DEBUG или
+       сотрудникам. Пользователь берется уже определенный представлением,
+       ленивый пользователь сессии не вычисляется ради заголовка.'''
+    if settings.DEBUG:
+        return True
+    user = getattr(request, 'user', None)
+    if isinstance(user, SimpleLazyObject) and user._wrapped is empty:
+        return False
+    return is_staff(user)
+
+
+class RequestInstrumentationMiddleware:
+    '''Статистика SQL и этапов обработки каждого запроса.
+
+    Итог пишется в лог одной строкой JSON, в DEBUG или сотрудникам
+    отдается и в заголовке Server-Timing; медленные запросы логируются
+    со всеми SQL.
+    Генерация потоковых ответов в замер не входит.
+    '''
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        for connection in connections.all():
+            install_sql_recorder(connection)
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.finish(request, response, stats)
+
+    def finish(self, request, response, stats):
+        data = stats.report(request, response)
+        observe_request(data)
+        if timing_visible(request):
+            response['Server-Timing'] = server_timing(data)
+        if data['total_ms'] >= settings.SLOW_REQUEST_THRESHOLD_MS:
+            logger.warning(json.dumps(
+                stats.report(request, response, full=True),
+                ensure_ascii=False, default=str
+            ))
+        else:
+            logger.info(json.dumps(data, ensure_ascii=False))
+        return response
+
+    def process_template_response(self, request, response):
+        '''Отрисовка ответа DRF идет после представления.'''
+        stats = current_stats.get()
+        if stats is None:
+            return response
+        started = time.perf_counter()
+
+        def rendered(response):
+            stats.timings['render'] += time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_PARAM = '_profile'
+PROFILE_MODES = ('save', 'download', 'text')
+
+
+def profiling_user(request):
+    '''Пользователь по токену или сессии; вызывается до остальных
+       middleware, поэтому request.user еще не установлен.'''
+    try:
+        authenticated = CachedTokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    if authenticated is not None:
+        return authenticated[0]
+    session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if session_key is None:
+        return None
+    engine = import_module(settings.SESSION_ENGINE)
+    return get_user(SimpleNamespace(
+        session=engine.SessionStore(session_key)
+    ))
+
+
+class ProfilingMiddleware:
+    '''cProfile одного запроса по требованию сотрудника.
+
+    Профилирование включается заголовком X-Profile или параметром
+    _profile: save сохраняет .prof в PROFILE_DIR, download отдает его
+    вместо ответа, text - текстовый отчет pstats. Запросы без флага
+    проходят без дополнительной работы.
+
+    Выключено по умолчанию, включается REQUEST_PROFILING=True. Под ASGI
+    не поддерживается: cProfile видит только поток цикла событий с
+    чужими запросами, а синхронный код представлений идет в других
+    потоках. Такие запросы выполняются как обычно с X-Profile: unsupported.
+    '''
+    sync_capable = True
+    async_capable = True
+    lock = threading.Lock()
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        mode = requested_mode(request)
+        if not mode or not is_staff(profiling_user(request)):
+            return self.get_response(request)
+        if not self.lock.acquire(blocking=False):
+            return busy(self.get_response(request))
+        try:
+            profile = cProfile.Profile()
+            response = profile.runcall(self.run, request)
+        finally:
+            self.lock.release()
+        return self.finish(request, response, profile, mode)
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if requested_mode(request):
+            response['X-Profile'] = 'unsupported'
+        return response
+
+    def finish(self, request, response, profile, mode):
+        if mode == 'download':
+            response = HttpResponse(
+                marshal_stats(profile),
+                content_type='application/octet-stream'
+            )
+            response['Content-Disposition'] = (
+                f'attachment; filename="{profile_name(request)}"'
+            )
+        elif mode == 'text':
+            response = HttpResponse(
+                stats_text(profile),
+                content_type='text/plain; charset=utf-8'
+            )
+        else:
+            name = profile_name(request)
+            os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+            profile.dump_stats(os.path.join(settings.PROFILE_DIR, name))
+            response['X-Profile'] = name
+        return response
+
+    def run(self, request):
+        '''Запрос целиком, включая генерацию потокового ответа.'''
+        response = self.get_response(request)
+        if response.streaming:
+            response.streaming_content = [
+                b''.join(response.streaming_content)
+            ]
+        return response
+
+
+def requested_mode(request):
+    mode = (request.META.get(PROFILE_HEADER)
+            or request.GET.get(PROFILE_PARAM))
+    if not mode:
+        return None
+    return mode if mode in PROFILE_MODES else 'save'
+
+
+def is_staff(user):
+    return user is not None and user.is_staff
+
+
+def busy(response):
+    response['X-Profile'] = 'busy'
+    return response
+
+
+def profile_name(request):
+    path = re.sub(r'[^\w-]+', '-', request.path).strip('-')
+    return (f'{timezone.now():%Y%m%d-%H%M%S-%f}-{request.method}-'
+            f'{path or "root"}.prof')
+
+
+def marshal_stats(profile):
+    '''Бинарный дамп в формате pstats, как у dump_stats.'''
+    profile.create_stats()
+    return marshal.dumps(profile.stats)
+
+
+def stats_text(profile, limit=60):
+    output = io.StringIO()
+    stats = pstats.Stats(profile, stream=output)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+    return output.getvalue()
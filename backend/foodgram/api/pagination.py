@@ -1,6 +1,53 @@
-from rest_framework.pagination import PageNumberPagination
+from django.core.paginator import InvalidPage
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 
 class PageLimitPagination(PageNumberPagination):
     page_size_query_param = 'limit'
     page_size = 6
+
+    async def apaginate_queryset(self, queryset, request):
+        '''paginate_queryset на асинхронном ORM: COUNT через acount,
+           страница через async for.'''
+        page_size = self.get_page_size(request)
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            page_number = paginator.validate_number(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            ))
+        bottom = (page_number - 1) * page_size
+        items = [item async for item in
+                 queryset[bottom:bottom + page_size]]
+        self.page = paginator._get_page(items, page_number, paginator)
+        self.request = request
+        return list(self.page)
+
+
+class RecipeCursorPagination(CursorPagination):
+    '''Постраничный вывод рецептов по курсору (-pub_date, -id)
+       без COUNT(*) и OFFSET.'''
+    ordering = ('-pub_date', '-id')
+    page_size_query_param = 'limit'
+    page_size = 6
+    # Фильтры со своим порядком выдачи, который курсор заменил бы.
+    ranked_params = ('search', 'ingredients')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ranked = [param for param in self.ranked_params
+                  if request.query_params.get(param)]
+        if ranked:
+            raise ValidationError({'pagination': (
+                'Курсор выдает рецепты по дате и не сочетается '
+                f'с {", ".join(ranked)}: используйте page и limit.'
+            )})
+        return super().paginate_queryset(queryset, request, view)
+
+    @classmethod
+    def is_requested(cls, request):
+        return (cls.cursor_query_param in request.GET
+                or request.GET.get('pagination') == 'cursor')
@@ -0,0 +1,138 @@
+import re
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, FloatField, Value, When
+from recipe.models import Recipe
+
+from .metrics import record_cache
+
+WORD = re.compile(r'\w+')
+NAME_WEIGHT = 1.0
+TEXT_WEIGHT = 0.4
+
+
+def tokenize(text):
+    return WORD.findall(text.casefold().replace('ё', 'е'))
+
+
+class RecipeSearchIndex:
+    '''Инвертированный индекс рецептов в памяти процесса.
+
+    Запасной вариант полнотекстового поиска для баз без tsvector
+    (SQLite в разработке). Слова из названия весят больше слов
+    из описания, как веса A и B в PostgreSQL. Индекс обновляется
+    сигналами при сохранении рецептов и полностью перестраивается
+    по истечении RECIPE_SEARCH_INDEX_TTL.
+    '''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = None
+        self._documents = None
+        self._built_at = 0
+
+    @property
+    def is_warm(self):
+        return (self._postings is not None
+                and time.monotonic() - self._built_at
+                < settings.RECIPE_SEARCH_INDEX_TTL)
+
+    def search(self, query):
+        '''Ранги рецептов, содержащих все слова query: {id: ранг}.'''
+        record_cache('recipe_search_index', self.is_warm)
+        if not self.is_warm:
+            self.build()
+        terms = set(tokenize(query))
+        if not terms:
+            return {}
+        with self._lock:
+            postings = [self._postings.get(term, {}) for term in terms]
+            postings.sort(key=len)
+            return {
+                recipe_id: round(sum(posting[recipe_id]
+                                     for posting in postings), 3)
+                for recipe_id in postings[0]
+                if all(recipe_id in posting for posting in postings[1:])
+            }
+
+    def build(self):
+        postings = defaultdict(dict)
+        documents = {}
+        for recipe_id, name, text in (Recipe.objects
+                                      .values_list('id', 'name', 'text')
+                                      .iterator()):
+            documents[recipe_id] = self._add(postings, recipe_id, name, text)
+        with self._lock:
+            self._postings, self._documents = postings, documents
+            self._built_at = time.monotonic()
+
+    def update(self, recipe):
+        with self._lock:
+            if self._postings is None:
+                return
+            self._remove(recipe.id)
+            self._documents[recipe.id] = self._add(
+                self._postings, recipe.id, recipe.name, recipe.text
+            )
+
+    def remove(self, recipe_id):
+        with self._lock:
+            if self._postings is not None:
+                self._remove(recipe_id)
+
+    @staticmethod
+    def _add(postings, recipe_id, name, text):
+        weights = defaultdict(float)
+        for term in tokenize(name):
+            weights[term] += NAME_WEIGHT
+        for term in tokenize(text):
+            weights[term] += TEXT_WEIGHT
+        for term, weight in weights.items():
+            postings[term][recipe_id] = weight
+        return tuple(weights)
+
+    def _remove(self, recipe_id):
+        for term in self._documents.pop(recipe_id, ()):
+            posting = self._postings[term]
+            posting.pop(recipe_id, None)
+            if not posting:
+                del self._postings[term]
+
+
+recipe_search_index = RecipeSearchIndex()
+
+
+def search_recipes(queryset, query):
+    '''Рецепты queryset, найденные по query, в порядке релевантности.'''
+    if connection.vendor == 'postgresql':
+        return queryset.search(query)
+    ranks = recipe_search_index.search(query)
+    if not ranks:
+        return queryset.none()
+    by_rank = defaultdict(list)
+    for recipe_id, rank in ranks.items():
+        by_rank[rank].append(recipe_id)
+    return queryset.filter(pk__in=ranks).annotate(
+        search_rank=Case(
+            *(When(pk__in=recipe_ids, then=Value(rank))
+              for rank, recipe_ids in by_rank.items()),
+            output_field=FloatField()
+        )
+    ).order_by('-search_rank', '-pub_date', '-id')
+
+
+def recipe_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not {'name', 'text'} & set(
+            update_fields):
+        return
+    if connection.vendor == 'postgresql':
+        Recipe.objects.filter(pk=instance.pk).update_search_vector()
+    else:
+        recipe_search_index.update(instance)
+
+
+def recipe_deleted(sender, instance, **kwargs):
+    recipe_search_index.remove(instance.pk)
@@ -0,0 +1,37 @@
+import json
+
+from rest_framework import renderers
+
+
+class ShoppingListRenderer(renderers.BaseRenderer):
+    '''Формат выгрузки списка покупок.
+
+    Сам файл отдает представление, рендерер нужен только для выбора
+    формата по ?format= или заголовку Accept. Ошибки выводит
+    JSONRenderer (RecipeViewSet.handle_exception).
+    '''
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+class PDFRenderer(ShoppingListRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+
+
+class CSVRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class PlainTextRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class JSONExportRenderer(ShoppingListRenderer):
+    media_type = 'application/json'
+    format = 'json'
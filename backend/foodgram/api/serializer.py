@@ -10,10 +10,15 @@ from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 from users.models import Follow, User
 
-from .utils import create_ingredients
+from .fields import StreamingBase64ImageField
+from .images import schedule_image_processing
+from .membership import is_member
+from .middleware import TimedSerializerMixin
+from .tag_registry import tag_registry
+from .utils import create_ingredients, get_recipes_limit, update_ingredients
 
 
-class UserGetSerializer(UserSerializer):
+class UserGetSerializer(TimedSerializerMixin, UserSerializer):
     is_subscribed = serializers.SerializerMethodField()
 
     class Meta:
@@ -23,15 +28,12 @@ class UserGetSerializer(UserSerializer):
                   'is_subscribed', 'id')
 
     def get_is_subscribed(self, obj):
-        user = self.context['request'].user
-        return (user.is_authenticated
-                and Follow.objects.filter(
-                    user=user,
-                    author=obj
-                ). exists())
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return is_member(self.context['request'].user, 'follows', obj.id)
 
 
-class UserSignUpSerializer(UserCreateSerializer):
+class UserSignUpSerializer(TimedSerializerMixin, UserCreateSerializer):
     '''Сериализатор регистрации пользователя.'''
     class Meta:
         model = User
@@ -40,14 +42,16 @@ class UserSignUpSerializer(UserCreateSerializer):
                   'password')
 
 
-class RecipeSmallSerializer(serializers.ModelSerializer):
+class RecipeSmallSerializer(TimedSerializerMixin,
+                            serializers.ModelSerializer):
     """Сериализатор для работы с краткой информацией о рецепте."""
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image',
+                  'thumbnail', 'image_webp', 'cooking_time')
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     '''Сериализатор для работы с тэгами.'''
     class Meta:
         model = Tag
@@ -55,14 +59,16 @@ class TagSerializer(serializers.ModelSerializer):
                   'color', 'slug')
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin,
+                           serializers.ModelSerializer):
     ''''Сериализатор для ингредиентов.'''
     class Meta:
         model = Ingredient
         fields = ('__all__')
 
 
-class IngredientAmountGetSerializer(serializers.ModelSerializer):
+class IngredientAmountGetSerializer(TimedSerializerMixin,
+                                    serializers.ModelSerializer):
     '''Сериаализатор для отображения количества ингредиентов.'''
     id = serializers.IntegerField(source='ingredient.id',
                                   read_only=True)
@@ -120,7 +126,8 @@ class FavoriteSerializer(serializers.ModelSerializer):
         ).data
 
 
-class RecipeGetSerializer(serializers.ModelSerializer):
+class RecipeGetSerializer(TimedSerializerMixin,
+                          serializers.ModelSerializer):
     '''Сериализатор получения рецепта.'''
     tags = TagSerializer(
         read_only=True,
@@ -145,22 +152,29 @@ class RecipeGetSerializer(serializers.ModelSerializer):
         fields = ('id', 'tags',
                   'author', 'ingredients',
                   'is_favorited', 'is_in_shopping_cart',
-                  'name', 'image',
+                  'name', 'image', 'thumbnail', 'image_webp',
                   'text', 'cooking_time')
 
     def get_is_favorited(self, obj):
-        request = self.context['request']
-        user = self.context['request'].user
-        return (request and user.is_authenticated
-                and Favorite.objects.filter(user=user,
-                                            recipe=obj).exists())
+        return is_member(self.context['request'].user, 'favorites', obj.id)
 
     def get_is_in_shopping_cart(self, obj):
-        request = self.context['request']
-        user = self.context['request'].user
-        return (request and user.is_authenticated
-                and ShoppingCart.objects.filter(user=user,
-                                                recipe=obj).exists())
+        return is_member(self.context['request'].user,
+                         'shopping_cart', obj.id)
+
+
+class TagPrimaryKeyField(serializers.PrimaryKeyRelatedField):
+    '''Тэг по id из реестра тэгов, без запроса к БД.'''
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            tag = tag_registry.get(int(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if tag is None:
+            self.fail('does_not_exist', pk_value=data)
+        return tag
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
@@ -170,12 +184,12 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         required=True,
         many=True,
     )
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = TagPrimaryKeyField(
         queryset=Tag.objects.all(),
         required=True,
         many=True
     )
-    image = Base64ImageField(
+    image = StreamingBase64ImageField(
         required=True
     )
     cooking_time = serializers.IntegerField(
@@ -189,30 +203,42 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                   'text', 'cooking_time')
 
     def validate(self, attrs):
-        name = attrs['name']
-        if re.match(r'^[0-9\W]+$', name):
+        if 'name' in attrs and re.match(r'^[0-9\W]+$', attrs['name']):
             raise ValidationError(
                 'Название не может состоять из цифр или знаков'
             )
-        ingredients = attrs['ingredientamount']
-        ingredients_list = []
+        if 'ingredientamount' in attrs:
+            self.check_ingredients(attrs['ingredientamount'])
+        if 'tags' in attrs:
+            self.check_tags(attrs['tags'])
+        if 'cooking_time' in attrs and attrs['cooking_time'] < 1:
+            raise serializers.ValidationError(
+                'Время приготовления должно быть минимум 1 минута!'
+            )
+        return attrs
+
+    def check_ingredients(self, ingredients):
+        ingredients_list = [ingredient['id'] for ingredient in ingredients]
+        missing = set(ingredients_list) - set(
+            Ingredient.objects.filter(id__in=ingredients_list)
+            .values_list('id', flat=True)
+        )
+        if missing:
+            raise serializers.ValidationError(
+                'Игридиентов '
+                f'{", ".join(map(str, sorted(missing)))} нет в базе!'
+            )
         for ingredient in ingredients:
-            if not Ingredient.objects.filter(
-                    id=ingredient['id']).exists():
-                raise serializers.ValidationError(
-                    f'Игридиента {ingredient["id"]} нет в базе!'
-                )
             if ingredient['amount'] < 1:
                 raise serializers.ValidationError(
                     f'Ингредиента {ingredient["id"]} - не может быть меньше 1!'
                 )
-            ingredients_list.append(ingredient['id'])
         if len(ingredients) != len(set(ingredients_list)):
             raise serializers.ValidationError(
                 'Вы указали повторяющиеся ингредиенты!'
             )
 
-        tags = attrs['tags']
+    def check_tags(self, tags):
         tags_list = []
         if not tags:
             raise serializers.ValidationError(
@@ -225,13 +251,6 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                 )
             tags_list.append(tag)
 
-        cooking_time = attrs['cooking_time']
-        if cooking_time < 1:
-            raise serializers.ValidationError(
-                'Время приготовления должно быть минимум 1 минута!'
-            )
-        return attrs
-
     @transaction.atomic
     def create(self, validated_data):
         request = self.context['request']
@@ -239,24 +258,35 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         ingredients = validated_data.pop('ingredientamount')
         tags = validated_data.pop('tags')
         recipe = Recipe.objects.create(
-            author=author, **validated_data
+            author=author, ingredients_count=len(ingredients),
+            **validated_data
         )
         recipe.tags.set(tags)
         create_ingredients(ingredients, recipe)
+        schedule_image_processing(recipe)
         return recipe
 
     @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients_new = validated_data.pop('ingredientamount')
-        instance.ingredients.clear()
-        create_ingredients(ingredients_new, instance)
-        tags_new = validated_data.pop('tags')
-        instance.tags.set(tags_new)
-        return super().update(instance,
-                              validated_data)
+        ingredients_new = validated_data.pop('ingredientamount', None)
+        if ingredients_new is not None:
+            update_ingredients(ingredients_new, instance)
+            validated_data['ingredients_count'] = len(ingredients_new)
+        tags_new = validated_data.pop('tags', None)
+        if tags_new is not None:
+            instance.tags.set(tags_new)
+        image_changed = 'image' in validated_data
+        if image_changed:
+            stale_files = (instance.thumbnail.name, instance.image_webp.name)
+            validated_data.update(thumbnail='', image_webp='')
+        instance = super().update(instance, validated_data)
+        if image_changed:
+            schedule_image_processing(instance, stale_files)
+        return instance
 
     def to_representation(self, instance):
         request = self.context.get('request')
+        instance = Recipe.objects.for_read().get(pk=instance.pk)
         return RecipeGetSerializer(
             instance,
             context={'request': request}
@@ -292,15 +322,19 @@ class UserSubscriptionsGetSerializer(UserRecipesGetSerializer):
 
     def get_recipes(self, obj):
         request = self.context['request']
-        if request:
-            recipes_limit = request.query_params.get('recipes_limit')
-        recipes = obj.recipes.all()
-        if recipes_limit:
-            recipes = recipes[:int(recipes_limit)]
+        if hasattr(obj, 'latest_recipes'):
+            recipes = obj.latest_recipes
+        else:
+            recipes = obj.recipes.all()
+            recipes_limit = get_recipes_limit(request)
+            if recipes_limit is not None:
+                recipes = recipes[:recipes_limit]
         return RecipeSmallSerializer(recipes, many=True,
                                      context={'request': request}).data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return obj.recipes.count()
 
 
@@ -0,0 +1,128 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models import QuerySet, Sum
+from recipe.models import (IngredientAmount, Recipe, ShoppingCart,
+                           ShoppingListItem)
+from users.models import User
+
+ingredients_batch = ContextVar('ingredients_batch', default=False)
+
+
+def cart_totals(user_ids, ingredient_ids=None):
+    '''Суммы ингредиентов в корзинах пользователей, посчитанные по рецептам.
+
+    Возвращает словарь {(user_id, ingredient_id): amount}.
+    '''
+    amounts = IngredientAmount.objects.filter(
+        recipe__shoppingcart__user__in=user_ids
+    )
+    if ingredient_ids is not None:
+        amounts = amounts.filter(ingredient__in=ingredient_ids)
+    totals = amounts.values(
+        'recipe__shoppingcart__user', 'ingredient'
+    ).annotate(total=Sum('amount')).order_by()
+    return {(row['recipe__shoppingcart__user'], row['ingredient']):
+            row['total'] for row in totals}
+
+
+def refresh_shopping_lists(user_ids, ingredient_ids=None):
+    '''Пересчитывает строки списка покупок пользователей user_ids
+       для ингредиентов ingredient_ids (всех, если None).'''
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    with transaction.atomic():
+        # Блокировка строк пользователей упорядочивает параллельные
+        # пересчеты: каждый видит суммы после коммита предыдущего,
+        # и последний записавший не затирает чужое изменение корзины.
+        user_ids = list(
+            User.objects.select_for_update().filter(id__in=user_ids)
+            .order_by('id').values_list('id', flat=True)
+        )
+        totals = cart_totals(user_ids, ingredient_ids)
+        items = ShoppingListItem.objects.filter(user__in=user_ids)
+        if ingredient_ids is not None:
+            items = items.filter(ingredient__in=ingredient_ids)
+        stale = [
+            item_id for item_id, user_id, ingredient_id
+            in items.values_list('id', 'user', 'ingredient')
+            if (user_id, ingredient_id) not in totals
+        ]
+        if stale:
+            ShoppingListItem.objects.filter(id__in=stale).delete()
+        if totals:
+            ShoppingListItem.objects.bulk_create(
+                [ShoppingListItem(user_id=user_id,
+                                  ingredient_id=ingredient_id,
+                                  amount=amount)
+                 for (user_id, ingredient_id), amount in totals.items()],
+                update_conflicts=True,
+                unique_fields=('user', 'ingredient'),
+                update_fields=('amount',),
+            )
+
+
+def refresh_recipe_in_carts(recipe, ingredient_ids=None):
+    '''Пересчет списков покупок после изменения ингредиентов рецепта.'''
+    refresh_shopping_lists(
+        ShoppingCart.objects.filter(recipe=recipe)
+        .values_list('user', flat=True),
+        ingredient_ids
+    )
+
+
+@contextmanager
+def batch_ingredient_changes():
+    '''Ингредиенты рецепта меняются пачкой: обработчики отдельных
+       строк IngredientAmount пропускаются, вызывающий сам пересчитывает
+       списки покупок и количество ингредиентов один раз.'''
+    token = ingredients_batch.set(True)
+    try:
+        yield
+    finally:
+        ingredients_batch.reset(token)
+
+
+def is_recipe_deletion(origin):
+    '''Удаление начато с рецепта или набора рецептов: зависимые строки
+       удаляются каскадом, списки покупок пересчитывает cart_recipe_deleted.'''
+    if isinstance(origin, QuerySet):
+        return origin.model is Recipe
+    return isinstance(origin, Recipe)
+
+
+def ingredient_rows_handled(origin=None):
+    return ingredients_batch.get() or is_recipe_deletion(origin)
+
+
+def cart_changed(sender, instance, origin=None, **kwargs):
+    if is_recipe_deletion(origin):
+        return
+    ingredient_ids = list(
+        IngredientAmount.objects.filter(recipe=instance.recipe_id)
+        .values_list('ingredient', flat=True)
+    )
+    if ingredient_ids:
+        refresh_shopping_lists([instance.user_id], ingredient_ids)
+
+
+def ingredient_amount_changed(sender, instance, origin=None, **kwargs):
+    if ingredient_rows_handled(origin):
+        return
+    refresh_recipe_in_carts(instance.recipe_id)
+
+
+def cart_recipe_deleting(sender, instance, **kwargs):
+    '''Запоминает, в чьих корзинах был рецепт, до каскадного удаления.'''
+    instance._cart_users = list(
+        ShoppingCart.objects.filter(recipe=instance)
+        .values_list('user', flat=True)
+    )
+
+
+def cart_recipe_deleted(sender, instance, **kwargs):
+    '''Один пересчет списков покупок вместо пересчета на каждую
+       удаленную строку корзины и ингредиентов.'''
+    refresh_shopping_lists(getattr(instance, '_cart_users', ()))
@@ -0,0 +1,62 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete
+from recipe.models import (Ingredient, IngredientAmount, Recipe, ShoppingCart,
+                           Tag)
+from rest_framework.authtoken.models import Token
+from users.models import User
+
+from .authentication import token_deleted, user_changed
+from .ingredient_index import ingredient_index
+from .membership import SENDERS, membership_deleted, membership_saved
+from .middleware import install_sql_recorder
+from .recipe_search import recipe_deleted, recipe_saved
+from .shopping_list import (cart_changed, cart_recipe_deleted,
+                            cart_recipe_deleting, ingredient_amount_changed)
+from .tag_registry import tag_registry
+from .utils import ingredients_count_changed
+
+post_save.connect(ingredient_index.invalidate, sender=Ingredient,
+                  dispatch_uid='ingredient_index_save')
+post_delete.connect(ingredient_index.invalidate, sender=Ingredient,
+                    dispatch_uid='ingredient_index_delete')
+post_save.connect(tag_registry.invalidate, sender=Tag,
+                  dispatch_uid='tag_registry_save')
+post_delete.connect(tag_registry.invalidate, sender=Tag,
+                    dispatch_uid='tag_registry_delete')
+
+for sender in SENDERS:
+    post_save.connect(membership_saved, sender=sender,
+                      dispatch_uid=f'membership_save_{sender.__name__}')
+    post_delete.connect(membership_deleted, sender=sender,
+                        dispatch_uid=f'membership_delete_{sender.__name__}')
+
+post_save.connect(cart_changed, sender=ShoppingCart,
+                  dispatch_uid='shopping_list_cart_save')
+post_delete.connect(cart_changed, sender=ShoppingCart,
+                    dispatch_uid='shopping_list_cart_delete')
+post_save.connect(ingredient_amount_changed, sender=IngredientAmount,
+                  dispatch_uid='shopping_list_amount_save')
+post_delete.connect(ingredient_amount_changed, sender=IngredientAmount,
+                    dispatch_uid='shopping_list_amount_delete')
+pre_delete.connect(cart_recipe_deleting, sender=Recipe,
+                   dispatch_uid='shopping_list_recipe_deleting')
+post_delete.connect(cart_recipe_deleted, sender=Recipe,
+                    dispatch_uid='shopping_list_recipe_delete')
+post_save.connect(recipe_saved, sender=Recipe,
+                  dispatch_uid='recipe_search_save')
+post_delete.connect(recipe_deleted, sender=Recipe,
+                    dispatch_uid='recipe_search_delete')
+post_save.connect(ingredients_count_changed, sender=IngredientAmount,
+                  dispatch_uid='recipe_ingredients_count_save')
+post_delete.connect(ingredients_count_changed, sender=IngredientAmount,
+                    dispatch_uid='recipe_ingredients_count_delete')
+
+connection_created.connect(install_sql_recorder,
+                           dispatch_uid='install_sql_recorder')
+
+post_delete.connect(token_deleted, sender=Token,
+                    dispatch_uid='auth_token_delete')
+post_save.connect(user_changed, sender=User,
+                  dispatch_uid='auth_token_user_save')
+post_delete.connect(user_changed, sender=User,
+                    dispatch_uid='auth_token_user_delete')
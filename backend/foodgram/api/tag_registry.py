@@ -0,0 +1,114 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from recipe.models import Tag
+
+from .metrics import record_cache
+
+VERSION_KEY = 'tag_registry_version'
+
+
+class TagRegistry:
+    '''Тэги в памяти процесса.
+
+    Таблица тэгов почти не меняется, поэтому читается один раз.
+    Номер версии хранится в кэше Django: сигналы сохранения и удаления
+    тэга увеличивают его после коммита, и каждый процесс перечитывает
+    тэги, заметив новую версию. Версия читается из кэша не чаще раза
+    в TAG_REGISTRY_CHECK_INTERVAL. Кроме того, тэги перечитываются
+    по истечении TAG_REGISTRY_TTL, если изменение версии не дошло
+    до процесса.
+    '''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._loaded_at = 0
+        self._checked_at = 0
+        self._tags = ()
+        self._by_id = {}
+        self._by_slug = {}
+
+    def _load(self):
+        if self._checked_recently():
+            return
+        version = cache.get_or_set(VERSION_KEY, 0, timeout=None)
+        if not self._is_fresh(version):
+            self._store(version, tuple(Tag.objects.all()))
+
+    async def _aload(self):
+        if self._checked_recently():
+            return
+        version = await cache.aget_or_set(VERSION_KEY, 0, timeout=None)
+        if not self._is_fresh(version):
+            self._store(version, tuple([tag async for tag in
+                                        Tag.objects.all()]))
+
+    def _checked_recently(self):
+        checked = (self._version is not None
+                   and time.monotonic() - self._checked_at
+                   < settings.TAG_REGISTRY_CHECK_INTERVAL)
+        if checked:
+            record_cache('tag_registry', True)
+        return checked
+
+    def _is_fresh(self, version):
+        fresh = (version == self._version
+                 and time.monotonic() - self._loaded_at
+                 < settings.TAG_REGISTRY_TTL)
+        record_cache('tag_registry', fresh)
+        if fresh:
+            self._checked_at = time.monotonic()
+        return fresh
+
+    def _store(self, version, tags):
+        with self._lock:
+            self._by_id = {tag.id: tag for tag in tags}
+            self._by_slug = {tag.slug: tag for tag in tags}
+            self._tags = tags
+            self._version = version
+            self._loaded_at = self._checked_at = time.monotonic()
+
+    def all(self):
+        self._load()
+        return self._tags
+
+    def get(self, pk):
+        self._load()
+        return self._by_id.get(pk)
+
+    def get_by_slug(self, slug):
+        self._load()
+        return self._by_slug.get(slug)
+
+    async def aall(self):
+        await self._aload()
+        return self._tags
+
+    async def aget(self, pk):
+        await self._aload()
+        return self._by_id.get(pk)
+
+    def slug_choices(self):
+        return [(tag.slug, tag.name) for tag in self.all()]
+
+    def invalidate(self, **kwargs):
+        '''Новая версия видна другим процессам только после коммита,
+           иначе они перечитали бы старые тэги под новой версией.'''
+        transaction.on_commit(self._bump_version)
+
+    def _bump_version(self):
+        try:
+            cache.incr(VERSION_KEY)
+        except ValueError:
+            cache.set(VERSION_KEY, 1, timeout=None)
+        self.reset()
+
+    def reset(self):
+        '''Перечитать тэги при следующем обращении в этом процессе.'''
+        self._version = None
+
+
+tag_registry = TagRegistry()
@@ -0,0 +1,45 @@
+import base64
+from io import BytesIO
+
+import pytest
+from api.tag_registry import tag_registry
+from django.core.cache import cache
+from PIL import Image
+from rest_framework.test import APIClient
+from users.models import User
+
+PASSWORD = 'Test-Pa55word'
+
+
+@pytest.fixture(autouse=True)
+def isolated(settings, tmp_path):
+    '''Свои MEDIA_ROOT, кэш и реестр тэгов у каждого теста.'''
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.ALLOWED_HOSTS = ['testserver']
+    cache.clear()
+    tag_registry.reset()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def image():
+    '''Небольшая картинка в base64 для загрузки рецептов.'''
+    buffer = BytesIO()
+    Image.new('RGB', (2, 2)).save(buffer, format='PNG')
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/png;base64,{encoded}'
+
+
+@pytest.fixture
+def author(db):
+    return User.objects.create_user(
+        username='author', email='author@test.ru', password=PASSWORD
+    )
+
+
+@pytest.fixture
+def author_client(author):
+    client = APIClient()
+    client.force_authenticate(author)
+    return client
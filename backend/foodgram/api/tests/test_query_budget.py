@@ -0,0 +1,285 @@
+'''Бюджет SQL-запросов для каждого маршрута api/urls.py.
+
+Каждый эндпоинт вызывается на данных двух размеров: число запросов
+не должно расти с объемом данных и превышать бюджет из ENDPOINTS.
+При провале выводятся запросы, сгруппированные по месту вызова.
+'''
+import os
+import traceback
+from collections import defaultdict
+
+import pytest
+from api import middleware
+from api.ingredient_index import ingredient_index
+from api.membership import get_membership
+from api.recipe_search import recipe_search_index
+from api.shopping_list import refresh_shopping_lists
+from api.tag_registry import tag_registry
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from recipe.models import (Favorite, Ingredient, IngredientAmount, Recipe,
+                           ShoppingCart, Tag)
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.models import Follow, User
+
+PASSWORD = 'Budget-Pa55word'
+SIZES = (5, 50)
+# Через middleware проходит каждый запрос: ни ее обертка SQL,
+# ни вызов представления из нее не указывают на место в коде.
+PASS_THROUGH = middleware.__file__
+TESTS_DIR = os.path.dirname(__file__)
+
+
+def recipe_data(params):
+    '''Тело запроса на создание рецепта с n ингредиентами.'''
+    return {
+        'ingredients': [{'id': ingredient, 'amount': 10}
+                        for ingredient in params['ingredients']],
+        'tags': [params['tag']],
+        'image': params['image'],
+        'name': 'Новый рецепт',
+        'text': 'Описание',
+        'cooking_time': 15,
+    }
+
+
+def recipe_update_data(params):
+    '''Тело PATCH: из n ингредиентов своего рецепта остаются три,
+       с новым количеством.'''
+    return {**recipe_data(params),
+            'ingredients': [{'id': ingredient, 'amount': 10}
+                            for ingredient in params['own_ingredients'][:3]]}
+
+
+# Бюджет запросов для каждого маршрута из api/urls.py:
+# (название, метод, путь, тело запроса, максимум запросов).
+# Тело запроса может быть функцией от параметров seed().
+# Бюджеты посчитаны на PostgreSQL: в SQLite нет обновления
+# поискового вектора, и запись рецепта обходится на запрос дешевле.
+ENDPOINTS = (
+    ('tags-list', 'get', '/api/tags/', None, 0),
+    ('tags-detail', 'get', '/api/tags/{tag}/', None, 0),
+    ('ingredients-list', 'get', '/api/ingredients/?name=ing', None, 0),
+    ('ingredients-detail', 'get', '/api/ingredients/{ingredient}/',
+     None, 1),
+    ('recipes-list', 'get', '/api/recipes/?limit={n}', None, 4),
+    ('recipes-list-favorited', 'get',
+     '/api/recipes/?is_favorited=1&limit={n}', None, 4),
+    ('recipes-list-in-cart', 'get',
+     '/api/recipes/?is_in_shopping_cart=1&limit={n}', None, 4),
+    ('recipes-list-by-tag', 'get',
+     '/api/recipes/?tags={tag_slug}&limit={n}', None, 4),
+    ('recipes-search', 'get', '/api/recipes/?search=text&limit={n}',
+     None, 4),
+    ('recipes-cookable', 'get',
+     '/api/recipes/?ingredients={available}&limit={n}', None, 4),
+    ('recipes-detail', 'get', '/api/recipes/{recipe}/', None, 3),
+    ('recipes-create', 'post', '/api/recipes/', recipe_data, 11),
+    ('recipes-update', 'patch', '/api/recipes/{own_recipe}/',
+     recipe_update_data, 24),
+    ('recipes-delete', 'delete', '/api/recipes/{own_recipe}/', None, 17),
+    ('recipes-favorite-add', 'post', '/api/recipes/{fresh_recipe}/favorite/',
+     None, 5),
+    ('recipes-favorite-remove', 'delete',
+     '/api/recipes/{recipe}/favorite/', None, 4),
+    ('recipes-cart-add', 'post',
+     '/api/recipes/{fresh_recipe}/shopping_cart/', None, 12),
+    ('recipes-cart-remove', 'delete',
+     '/api/recipes/{recipe}/shopping_cart/', None, 11),
+    ('recipes-download-shopping-cart', 'get',
+     '/api/recipes/download_shopping_cart/', None, 1),
+    ('users-subscriptions', 'get',
+     '/api/users/subscriptions/?limit={n}&recipes_limit=3', None, 3),
+    ('users-subscribe', 'post', '/api/users/{stranger}/subscribe/',
+     None, 7),
+    ('users-unsubscribe', 'delete', '/api/users/{author}/subscribe/',
+     None, 4),
+    ('users-list', 'get', '/api/users/?limit={n}', None, 2),
+    ('users-detail', 'get', '/api/users/{author}/', None, 1),
+    ('users-me', 'get', '/api/users/me/', None, 0),
+    ('users-create', 'post', '/api/users/',
+     {'email': 'new@budget.ru', 'username': 'new_budget',
+      'first_name': 'New', 'last_name': 'Budget',
+      'password': PASSWORD}, 5),
+    ('users-set-password', 'post', '/api/users/set_password/',
+     {'current_password': PASSWORD,
+      'new_password': 'Another-Pa55word'}, 1),
+    ('token-login', 'post', '/api/auth/token/login/',
+     {'email': 'client@budget.ru', 'password': PASSWORD}, 3),
+    ('token-logout', 'post', '/api/auth/token/logout/', None, 2),
+)
+
+
+def seed(size):
+    '''Наполняет БД данными размера size
+       и возвращает параметры для путей.'''
+    client = User.objects.create_user(
+        username='client', email='client@budget.ru', password=PASSWORD
+    )
+    Token.objects.create(user=client)
+    tags = [
+        Tag.objects.create(name=f'tag{i}', color=f'#0000{i:02d}',
+                           slug=f'tag{i}')
+        for i in range(3)
+    ]
+    ingredients = Ingredient.objects.bulk_create(
+        Ingredient(name=f'ing{i}', measurement_unit='г')
+        for i in range(size)
+    )
+    authors = User.objects.bulk_create(
+        User(username=f'author{i}', email=f'author{i}@budget.ru')
+        for i in range(size + 1)
+    )
+    stranger = authors.pop()
+    Follow.objects.bulk_create(
+        Follow(user=client, author=author) for author in authors
+    )
+    recipes = Recipe.objects.bulk_create(
+        Recipe(author=author, name=f'recipe{i}', text='text',
+               cooking_time=10, image='media/budget.png')
+        for i, author in enumerate(authors + [stranger, client])
+    )
+    own_recipe = recipes.pop()
+    fresh_recipe = recipes.pop()
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe=recipe, tag=tag)
+        for recipe in recipes + [own_recipe] for tag in tags
+    )
+    IngredientAmount.objects.bulk_create(
+        IngredientAmount(recipe=recipe, ingredient=ingredient, amount=1)
+        for recipe in recipes + [fresh_recipe]
+        for ingredient in ingredients[:5]
+    )
+    own_ingredients = Ingredient.objects.bulk_create(
+        Ingredient(name=f'own{i}', measurement_unit='г')
+        for i in range(size)
+    )
+    IngredientAmount.objects.bulk_create(
+        IngredientAmount(recipe=own_recipe, ingredient=ingredient, amount=1)
+        for ingredient in own_ingredients
+    )
+    Recipe.objects.refresh_ingredients_count()
+    if connection.vendor == 'postgresql':
+        Recipe.objects.update_search_vector()
+    Favorite.objects.bulk_create(
+        Favorite(user=client, recipe=recipe) for recipe in recipes
+    )
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user=client, recipe=recipe)
+        for recipe in recipes + [own_recipe]
+    )
+    refresh_shopping_lists([client.id])
+    return client, {
+        'n': size,
+        'tag': tags[0].id,
+        'tag_slug': tags[0].slug,
+        'ingredient': ingredients[0].id,
+        'ingredients': [ingredient.id for ingredient in ingredients],
+        'own_ingredients': [ingredient.id for ingredient in own_ingredients],
+        'available': ','.join(str(ingredient.id)
+                              for ingredient in ingredients[:3]),
+        'recipe': recipes[0].id,
+        'own_recipe': own_recipe.id,
+        'fresh_recipe': fresh_recipe.id,
+        'author': authors[0].id,
+        'stranger': stranger.id,
+    }
+
+
+class CallSiteRecorder:
+    '''Запоминает место в коде проекта, откуда выполнен каждый запрос.'''
+    def __init__(self):
+        self.sites = defaultdict(list)
+
+    def __call__(self, execute, sql, params, many, context):
+        self.sites[self.call_site()].append(sql)
+        return execute(sql, params, many, context)
+
+    @staticmethod
+    def call_site():
+        '''Ближайший к SQL вызов вне ORM и, если это не код проекта,
+           вызвавшее его место в проекте.'''
+        orm_dir = os.path.join('django', 'db', '')
+        frames = [
+            frame for frame in reversed(traceback.extract_stack()[:-2])
+            if orm_dir not in frame.filename
+            and frame.filename != PASS_THROUGH
+        ]
+        if not frames:
+            return '<неизвестно>'
+        project = next((frame for frame in frames if is_project(frame)),
+                       None)
+        if project is None or project is frames[0]:
+            return describe(frames[0])
+        return f'{describe(frames[0])} <- {describe(project)}'
+
+
+def is_project(frame):
+    return (frame.filename.startswith(str(settings.BASE_DIR))
+            and not frame.filename.startswith(TESTS_DIR))
+
+
+def describe(frame):
+    path = frame.filename
+    if path.startswith(str(settings.BASE_DIR)):
+        path = os.path.relpath(path, settings.BASE_DIR)
+    path = path.rpartition('site-packages' + os.sep)[2]
+    return f'{path}:{frame.lineno} in {frame.name}'
+
+
+def measure(method, path, data, size, image):
+    '''SQL одного вызова эндпоинта на данных размера size
+       и они же по местам вызова; данные откатываются.'''
+    with transaction.atomic():
+        user, params = seed(size)
+        params['image'] = image
+        cache.clear()
+        ingredient_index.build()
+        recipe_search_index.build()
+        tag_registry.reset()
+        tag_registry.all()
+        get_membership(user)
+        del user._membership
+        client = APIClient()
+        client.force_authenticate(user)
+        if callable(data):
+            data = data(params)
+        recorder = CallSiteRecorder()
+        with CaptureQueriesContext(connection) as captured, \
+                connection.execute_wrapper(recorder):
+            response = getattr(client, method)(
+                path.format(**params), data, format='json'
+            )
+        assert response.status_code < 400, (
+            f'{method.upper()} {path.format(**params)} вернул '
+            f'{response.status_code}: {response.content[:200]}'
+        )
+        transaction.set_rollback(True)
+    return [query['sql'] for query in captured.captured_queries], \
+        recorder.sites
+
+
+def budget_report(name, counts, budget, sites):
+    lines = [f'{name}: {" -> ".join(map(str, counts))} (бюджет {budget})']
+    for site, statements in sorted(sites.items(),
+                                   key=lambda item: -len(item[1])):
+        lines.append(f'  {len(statements)} x {site}')
+        lines.extend(f'      {sql}' for sql in sorted(set(statements)))
+    return '\n'.join(lines)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'name, method, path, data, budget', ENDPOINTS,
+    ids=[endpoint[0] for endpoint in ENDPOINTS]
+)
+def test_query_budget(name, method, path, data, budget, image):
+    (small, _), (large, sites) = [
+        measure(method, path, data, size, image) for size in SIZES
+    ]
+    assert len(large) <= min(len(small), budget), budget_report(
+        name, (len(small), len(large)), budget, sites
+    )
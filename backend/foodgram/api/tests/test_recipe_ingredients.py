@@ -0,0 +1,62 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from recipe.models import Ingredient, IngredientAmount, Tag
+
+
+@pytest.fixture
+def ingredients(db):
+    return Ingredient.objects.bulk_create(
+        Ingredient(name=f'ingredient{i}', measurement_unit='г')
+        for i in range(20)
+    )
+
+
+@pytest.fixture
+def tag(db):
+    return Tag.objects.create(name='Завтрак', color='#E26C2D',
+                              slug='breakfast')
+
+
+def recipe_data(name, ingredient_ids, tag, image):
+    return {
+        'ingredients': [{'id': ingredient_id, 'amount': 10}
+                        for ingredient_id in ingredient_ids],
+        'tags': [tag.id],
+        'image': image,
+        'name': name,
+        'text': 'Описание',
+        'cooking_time': 15,
+    }
+
+
+def create_recipe(client, data):
+    '''Число SQL-запросов на создание рецепта.'''
+    with CaptureQueriesContext(connection) as captured:
+        response = client.post('/api/recipes/', data, format='json')
+    assert response.status_code == 201, response.content
+    return len(captured)
+
+
+def test_create_queries_do_not_grow_with_ingredients(author_client,
+                                                     ingredients, tag,
+                                                     image):
+    ids = [ingredient.id for ingredient in ingredients]
+    create_recipe(author_client, recipe_data('Прогрев', ids[:1], tag, image))
+    one = create_recipe(author_client,
+                        recipe_data('Один', ids[:1], tag, image))
+    twenty = create_recipe(author_client,
+                           recipe_data('Двадцать', ids, tag, image))
+    assert one == twenty
+    assert IngredientAmount.objects.filter(
+        recipe__name='Двадцать').count() == 20
+
+
+def test_every_missing_ingredient_is_reported(author_client, ingredients,
+                                              tag, image):
+    missing = [ingredients[-1].id + 1, ingredients[-1].id + 2]
+    response = author_client.post('/api/recipes/', recipe_data(
+        'Рецепт', [ingredients[0].id, *missing], tag, image
+    ), format='json')
+    assert response.status_code == 400
+    assert f'{missing[0]}, {missing[1]}' in str(response.json())
@@ -0,0 +1,90 @@
+import pytest
+from api.shopping_list import cart_totals
+from recipe.models import (Ingredient, IngredientAmount, Recipe,
+                           ShoppingListItem, Tag)
+from rest_framework.test import APIClient
+from users.models import User
+
+
+@pytest.fixture
+def buyer(db):
+    return User.objects.create_user(username='buyer', email='buyer@test.ru')
+
+
+@pytest.fixture
+def buyer_client(buyer):
+    client = APIClient()
+    client.force_authenticate(buyer)
+    return client
+
+
+@pytest.fixture
+def ingredients(db):
+    return Ingredient.objects.bulk_create(
+        Ingredient(name=f'ingredient{i}', measurement_unit='г')
+        for i in range(4)
+    )
+
+
+@pytest.fixture
+def recipes(author, ingredients):
+    '''Два рецепта с общим ингредиентом.'''
+    recipes = [
+        Recipe.objects.create(author=author, name=f'Рецепт {i}',
+                              text='Описание', cooking_time=10,
+                              image='media/test.png')
+        for i in range(2)
+    ]
+    for recipe, amounts in zip(recipes, ((0, 1), (1, 2))):
+        for amount, index in enumerate(amounts, 1):
+            IngredientAmount.objects.create(
+                recipe=recipe, ingredient=ingredients[index],
+                amount=amount * 100
+            )
+    return recipes
+
+
+def assert_matches_cart(user):
+    '''Сохраненный список покупок совпадает с подсчетом по корзине.'''
+    stored = dict(ShoppingListItem.objects.filter(user=user)
+                  .values_list('ingredient', 'amount'))
+    expected = {ingredient_id: amount for (_, ingredient_id), amount
+                in cart_totals([user.id]).items()}
+    assert stored == expected
+
+
+def test_shopping_list_follows_cart_and_recipes(buyer, buyer_client,
+                                                author_client, recipes,
+                                                ingredients, image):
+    for recipe in recipes:
+        response = buyer_client.post(
+            f'/api/recipes/{recipe.id}/shopping_cart/')
+        assert response.status_code == 201
+        assert_matches_cart(buyer)
+    assert ShoppingListItem.objects.get(
+        user=buyer, ingredient=ingredients[1]).amount == 300
+
+    response = buyer_client.delete(
+        f'/api/recipes/{recipes[0].id}/shopping_cart/')
+    assert response.status_code == 204
+    assert_matches_cart(buyer)
+
+    tag = Tag.objects.create(name='Обед', color='#49B64E', slug='lunch')
+    response = author_client.patch(f'/api/recipes/{recipes[1].id}/', {
+        'ingredients': [{'id': ingredients[2].id, 'amount': 50},
+                        {'id': ingredients[3].id, 'amount': 70}],
+        'tags': [tag.id],
+        'image': image,
+        'name': 'Новое название',
+        'text': 'Описание',
+        'cooking_time': 10,
+    }, format='json')
+    assert response.status_code == 200, response.content
+    assert_matches_cart(buyer)
+    assert ShoppingListItem.objects.get(
+        user=buyer, ingredient=ingredients[2]).amount == 50
+
+    response = author_client.delete(f'/api/recipes/{recipes[1].id}/')
+    assert response.status_code == 204
+    assert_matches_cart(buyer)
+    assert not ShoppingListItem.objects.filter(user=buyer).exists()
@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from .pagination import RecipeCursorPagination
 from .views import (IngredientViewSet, RecipeViewSet, TagViewSet,
                     UserFollowView, UserFollowViewSet)
 
@@ -18,3 +20,25 @@ urlpatterns = [
     path('auth/', include('djoser.urls.authtoken')),
     path('', include(router_v1.urls)),
 ]
+
+if settings.ASYNC_READ_VIEWS:
+    from . import async_views
+
+    router_views = {pattern.name: pattern.callback
+                    for pattern in router_v1.urls}
+    urlpatterns = [
+        path(route, async_views.async_read(read, router_views[name],
+                                           delegate), name=name)
+        for route, read, name, delegate in (
+            ('recipes/', async_views.recipe_list, 'recipes-list',
+             RecipeCursorPagination.is_requested),
+            ('recipes/<int:pk>/', async_views.recipe_detail,
+             'recipes-detail', None),
+            ('ingredients/', async_views.ingredient_list,
+             'ingredients-list', None),
+            ('ingredients/<int:pk>/', async_views.ingredient_detail,
+             'ingredients-detail', None),
+            ('tags/', async_views.tag_list, 'tags-list', None),
+            ('tags/<int:pk>/', async_views.tag_detail, 'tags-detail', None),
+        )
+    ] + urlpatterns
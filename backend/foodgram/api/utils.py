@@ -1,49 +1,173 @@
+import csv
+import json
 import os
-from io import BytesIO
+from functools import lru_cache
 
 from django.conf import settings
-from django.shortcuts import get_object_or_404
-from recipe.models import Ingredient, IngredientAmount
+from recipe.models import IngredientAmount, Recipe
 from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import simpleSplit
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.pdfgen import canvas
+from rest_framework.exceptions import ValidationError
+
+from .shopping_list import (batch_ingredient_changes, ingredient_rows_handled,
+                            refresh_recipe_in_carts)
+
+PDF_FONT = 'Lineyka'
+PDF_FONT_SIZE = 12
+PDF_LINE_HEIGHT = 25
+PDF_MARGIN_TOP = 42
+PDF_MARGIN_BOTTOM = 50
+PDF_MARGIN_LEFT = 80
+PDF_MARGIN_RIGHT = 50
+
+
+def get_recipes_limit(request):
+    '''Значение параметра recipes_limit или None, если он не передан.'''
+    if request is None:
+        return None
+    recipes_limit = request.query_params.get('recipes_limit')
+    if not recipes_limit:
+        return None
+    try:
+        recipes_limit = int(recipes_limit)
+    except ValueError:
+        recipes_limit = -1
+    if recipes_limit < 0:
+        raise ValidationError(
+            {'recipes_limit': 'Должно быть целым неотрицательным числом.'}
+        )
+    return recipes_limit
 
 
 def create_ingredients(ingredients, recipe):
-    for ingredient in ingredients:
-        ingredient_in_db = get_object_or_404(
-            Ingredient, id=ingredient['id']
+    IngredientAmount.objects.bulk_create(
+        IngredientAmount(
+            recipe=recipe,
+            ingredient_id=ingredient['id'],
+            amount=ingredient['amount'],
         )
-        amount = ingredient['amount']
-        IngredientAmount.objects.bulk_create([
-            IngredientAmount(
+        for ingredient in ingredients
+    )
+
+
+def update_ingredients(ingredients, recipe):
+    '''Применяет к рецепту только изменившиеся ингредиенты.'''
+    existing = {
+        ingredient_amount.ingredient_id: ingredient_amount
+        for ingredient_amount in recipe.ingredientamount.order_by()
+    }
+    to_create = []
+    to_update = []
+    for ingredient in ingredients:
+        ingredient_amount = existing.pop(ingredient['id'], None)
+        if ingredient_amount is None:
+            to_create.append(IngredientAmount(
                 recipe=recipe,
-                ingredient=ingredient_in_db,
-                amount=amount,
-            )
-        ])
+                ingredient_id=ingredient['id'],
+                amount=ingredient['amount'],
+            ))
+        elif ingredient_amount.amount != ingredient['amount']:
+            ingredient_amount.amount = ingredient['amount']
+            to_update.append(ingredient_amount)
+    if existing:
+        with batch_ingredient_changes():
+            IngredientAmount.objects.filter(
+                id__in=[item.id for item in existing.values()]
+            ).delete()
+    if to_update:
+        IngredientAmount.objects.bulk_update(to_update, ('amount',))
+    if to_create:
+        IngredientAmount.objects.bulk_create(to_create)
+    changed = [item.ingredient_id
+               for item in (*existing.values(), *to_update, *to_create)]
+    if changed:
+        refresh_recipe_in_carts(recipe, changed)
+
 
+def ingredients_count_changed(sender, instance, created=True, origin=None,
+                              **kwargs):
+    '''Пересчет для правок по одной строке (админка, ORM); сериализатор
+       сам сохраняет ingredients_count, у удаляемого рецепта он не нужен.'''
+    if created and not ingredient_rows_handled(origin):
+        Recipe.objects.filter(
+            pk=instance.recipe_id).refresh_ingredients_count()
 
-def create_pdf(ingredients_in_cart):
+
+@lru_cache(maxsize=None)
+def register_font():
+    '''Регистрирует шрифт один раз на процесс.'''
     font_path = os.path.join(settings.BASE_DIR, 'fonts', 'Lineyka.ttf')
-    pdfmetrics.registerFont(TTFont('Lineyka', font_path))
-    buffer = BytesIO()
-    docs = canvas.Canvas(buffer, pagesize=letter)
-    docs.setFont('Lineyka', 12)
-    docs.drawString(75, 750, 'Список ингредиентов:', mode=2)
-    coord_y = 750
-    count = 1
-    for ingredient in ingredients_in_cart:
+    pdfmetrics.registerFont(TTFont(PDF_FONT, font_path))
+
+
+def create_pdf(ingredients_in_cart, output):
+    '''Записывает список покупок в output постранично.'''
+    register_font()
+    width, height = letter
+    text_width = width - PDF_MARGIN_LEFT - PDF_MARGIN_RIGHT
+    docs = canvas.Canvas(output, pagesize=letter)
+    docs.setFont(PDF_FONT, PDF_FONT_SIZE)
+    docs.drawString(75, height - PDF_MARGIN_TOP, 'Список ингредиентов:',
+                    mode=2)
+    coord_y = height - PDF_MARGIN_TOP - PDF_LINE_HEIGHT
+    for count, ingredient in enumerate(ingredients_in_cart, start=1):
         name = ingredient['ingredient__name']
         unit = ingredient['ingredient__measurement_unit']
         amount = ingredient['ingredient_amount']
-        docs.drawString(80, coord_y - 25,
-                        f'{count}) {name} - {amount}{unit}')
-        count += 1
-        coord_y -= 25
+        lines = simpleSplit(f'{count}) {name} - {amount}{unit}',
+                            PDF_FONT, PDF_FONT_SIZE, text_width)
+        if coord_y - PDF_LINE_HEIGHT * (len(lines) - 1) < PDF_MARGIN_BOTTOM:
+            docs.showPage()
+            docs.setFont(PDF_FONT, PDF_FONT_SIZE)
+            coord_y = height - PDF_MARGIN_TOP
+        for line in lines:
+            docs.drawString(PDF_MARGIN_LEFT, coord_y, line)
+            coord_y -= PDF_LINE_HEIGHT
     docs.showPage()
     docs.save()
+    return output
+
+
+class Echo:
+    '''Псевдо-файл для csv.writer, возвращающий записанную строку.'''
+    def write(self, value):
+        return value
+
+
+def shopping_list_csv(ingredients_in_cart):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for ingredient in ingredients_in_cart:
+        yield writer.writerow((ingredient['ingredient__name'],
+                               ingredient['ingredient__measurement_unit'],
+                               ingredient['ingredient_amount']))
+
+
+def shopping_list_txt(ingredients_in_cart):
+    yield 'Список ингредиентов:\n'
+    for count, ingredient in enumerate(ingredients_in_cart, start=1):
+        yield (f'{count}) {ingredient["ingredient__name"]} - '
+               f'{ingredient["ingredient_amount"]}'
+               f'{ingredient["ingredient__measurement_unit"]}\n')
+
+
+def shopping_list_json(ingredients_in_cart):
+    separator = '['
+    for ingredient in ingredients_in_cart:
+        yield separator + json.dumps({
+            'name': ingredient['ingredient__name'],
+            'measurement_unit': ingredient['ingredient__measurement_unit'],
+            'amount': ingredient['ingredient_amount'],
+        }, ensure_ascii=False)
+        separator = ','
+    yield ']' if separator == ',' else '[]'
+
 
-    buffer.seek(0)
-    return buffer
+SHOPPING_LIST_EXPORTERS = {
+    'csv': shopping_list_csv,
+    'txt': shopping_list_txt,
+    'json': shopping_list_json,
+}
@@ -1,24 +1,32 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.conf import settings
+from django.db.models import BooleanField, Count, F, Prefetch, Value
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
-from recipe.models import (Favorite, Ingredient, IngredientAmount, Recipe,
-                           ShoppingCart, Tag)
+from recipe.models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                           ShoppingListItem, Tag)
 from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.generics import CreateAPIView, DestroyAPIView
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from users.models import Follow, User
 
 from .filters import IngredientFilter, RecipeFilter
+from .ingredient_index import ingredient_index
+from .middleware import timed
+from .pagination import PageLimitPagination, RecipeCursorPagination
 from .permissions import AdminAuthorOrReadOnly
+from .renderers import (CSVRenderer, JSONExportRenderer, PDFRenderer,
+                        PlainTextRenderer)
 from .serializer import (FavoriteSerializer, FollowCreateSerializer,
                          IngredientSerializer, RecipeCreateSerializer,
                          RecipeGetSerializer, ShoppingCartSerializer,
                          TagSerializer, UserSubscriptionsGetSerializer)
-from .utils import create_pdf
+from .tag_registry import tag_registry
+from .utils import SHOPPING_LIST_EXPORTERS, create_pdf, get_recipes_limit
 
 
 class UserFollowView(CreateAPIView,
@@ -56,7 +64,17 @@ class UserFollowViewSet(mixins.ListModelMixin,
     serializer_class = UserSubscriptionsGetSerializer
 
     def get_queryset(self):
-        return User.objects.filter(following__user=self.request.user)
+        recipes = Recipe.objects.latest_per_author(
+            get_recipes_limit(self.request)
+        )
+        return User.objects.filter(
+            following__user=self.request.user
+        ).annotate(
+            recipes_count=Count('recipes', distinct=True),
+            is_subscribed=Value(True, output_field=BooleanField()),
+        ).prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='latest_recipes')
+        ).order_by('-username')
 
 
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
@@ -66,6 +84,16 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = TagSerializer
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_serializer(tag_registry.all(), many=True)
+        return Response(serializer.data)
+
+    def retrieve(self, request, pk):
+        tag = tag_registry.get(int(pk)) if pk.isdigit() else None
+        if tag is None:
+            raise Http404
+        return Response(self.get_serializer(tag).data)
+
 
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     '''Работа с ингредиентами.'''
@@ -76,30 +104,65 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_class = IngredientFilter
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if not name:
+            return super().list(request, *args, **kwargs)
+        limit = settings.INGREDIENT_SEARCH_LIMIT
+        ingredients = ingredient_index.search(name, limit)
+        if ingredients is None:
+            queryset = self.filter_queryset(self.get_queryset())[:limit]
+            ingredients = self.get_serializer(queryset, many=True).data
+        return Response(ingredients)
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     '''Работа с рецептами.'''
     queryset = Recipe.objects.all()
-    pagination_class = PageNumberPagination
+    pagination_class = PageLimitPagination
     permission_classes = (AdminAuthorOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     http_method_names = ['get', 'post', 'patch', 'delete']
 
+    @property
+    def paginator(self):
+        if (not hasattr(self, '_paginator')
+                and RecipeCursorPagination.is_requested(self.request)):
+            self._paginator = RecipeCursorPagination()
+        return super().paginator
+
+    def handle_exception(self, exc):
+        '''Ошибки выгрузки списка покупок отдаются в JSON, а не с
+           Content-Type выбранного формата файла.'''
+        response = super().handle_exception(exc)
+        if self.action == 'download_shopping_cart':
+            self.request.accepted_renderer = JSONRenderer()
+            self.request.accepted_media_type = JSONRenderer.media_type
+        return response
+
     def get_serializer_class(self):
         if self.action in ('list', 'retrieve'):
             return RecipeGetSerializer
         return RecipeCreateSerializer
 
     def get_queryset(self):
+        if self.action not in ('list', 'retrieve'):
+            return Recipe.objects.all()
+        queryset = Recipe.objects.for_read()
+        user = self.request.user
         is_favorited = self.request.query_params.get('is_favorited')
         if is_favorited:
-            return Recipe.objects.filter(favorite__user=self.request.user)
+            if not user.is_authenticated:
+                return queryset.none()
+            return queryset.favorited_by(user)
         is_in_shopping_cart = (self.request.query_params
                                .get('is_in_shopping_cart'))
         if is_in_shopping_cart:
-            return Recipe.objects.filter(shoppingcart__user=self.request.user)
-        return Recipe.objects.all()
+            if not user.is_authenticated:
+                return queryset.none()
+            return queryset.in_shopping_cart_of(user)
+        return queryset
 
     @action(
         methods=['post', 'delete'],
@@ -154,16 +217,29 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @action(
         methods=['get'],
         detail=False,
-        permission_classes=(IsAuthenticated,)
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=(PDFRenderer, CSVRenderer,
+                          PlainTextRenderer, JSONExportRenderer)
     )
     def download_shopping_cart(self, request):
-        ingredients_in_cart = IngredientAmount.objects.filter(
-            recipe__shoppingcart__user=request.user).values(
+        ingredients_in_cart = ShoppingListItem.objects.filter(
+            user=request.user).values(
             'ingredient__name',
-            'ingredient__measurement_unit').annotate(
-            ingredient_amount=Sum('amount'))
-        buffer = create_pdf(ingredients_in_cart)
-        response = HttpResponse(buffer.read(), content_type='application/pdf')
-        response['Content-Disposition'] = ('attachement;'
-                                           'filename="ingredients.pdf"')
+            'ingredient__measurement_unit',
+            ingredient_amount=F('amount')).order_by('ingredient__name')
+        renderer = request.accepted_renderer
+        if renderer.format == 'pdf':
+            response = HttpResponse(content_type=renderer.media_type)
+            with timed('pdf'):
+                create_pdf(ingredients_in_cart, response)
+        else:
+            exporter = SHOPPING_LIST_EXPORTERS[renderer.format]
+            response = StreamingHttpResponse(
+                exporter(ingredients_in_cart.iterator(chunk_size=500)),
+                content_type=f'{renderer.media_type}; '
+                             f'charset={renderer.charset}'
+            )
+        response['Content-Disposition'] = (
+            f'attachment; filename="ingredients.{renderer.format}"'
+        )
         return response
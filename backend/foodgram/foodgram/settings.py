@@ -25,6 +25,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'colorfield',
     'rest_framework',
     'rest_framework.authtoken',
@@ -36,6 +37,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.ProfilingMiddleware',
+    'api.middleware.RequestInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -76,6 +79,19 @@ DATABASES = {
     }
 }
 
+# Кэш общий для всех воркеров gunicorn: в нем токены, наборы избранного,
+# корзины и подписок и версия реестра тэгов. LocMemCache без REDIS_URL -
+# только для разработки в одном процессе.
+REDIS_URL = os.getenv('REDIS_URL')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -114,7 +130,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.PageLimitPagination',
     'PAGE_SIZE': 6,
@@ -134,5 +150,54 @@ DJOSER = {
     }
 }
 
+RECIPE_IMAGE_MAX_BYTES = int(
+    os.getenv('RECIPE_IMAGE_MAX_BYTES', 10 * 1024 * 1024)
+)
+RECIPE_IMAGE_MAX_PIXELS = int(
+    os.getenv('RECIPE_IMAGE_MAX_PIXELS', 40_000_000)
+)
+RECIPE_THUMBNAIL_SIZE = (360, 360)
+RECIPE_IMAGE_MAX_SIZE = (1280, 1280)
+RECIPE_WEBP_QUALITY = 80
+RECIPE_IMAGE_WORKERS = int(os.getenv('RECIPE_IMAGE_WORKERS', 2))
+
+MEMBERSHIP_CACHE_TTL = int(os.getenv('MEMBERSHIP_CACHE_TTL', 300))
+# Кэш токенов требует общего кэша: без REDIS_URL выключен.
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 60 if REDIS_URL else 0))
+
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', 50))
+RECIPE_MIN_COVERAGE = float(os.getenv('RECIPE_MIN_COVERAGE', 0.5))
+RECIPE_SEARCH_INDEX_TTL = int(os.getenv('RECIPE_SEARCH_INDEX_TTL', 300))
+INGREDIENT_INDEX_TTL = int(os.getenv('INGREDIENT_INDEX_TTL', 300))
+TAG_REGISTRY_TTL = int(os.getenv('TAG_REGISTRY_TTL', 60))
+TAG_REGISTRY_CHECK_INTERVAL = int(os.getenv('TAG_REGISTRY_CHECK_INTERVAL', 5))
+
+SLOW_REQUEST_THRESHOLD_MS = float(
+    os.getenv('SLOW_REQUEST_THRESHOLD_MS', 500)
+)
+
+SERVER_INTERFACE = os.getenv('SERVER_INTERFACE', 'wsgi')
+ASYNC_READ_VIEWS = SERVER_INTERFACE == 'asgi'
+
+REQUEST_PROFILING = os.getenv('REQUEST_PROFILING', 'False') == 'True'
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(BASE_DIR, 'profiles'))
+
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api.middleware': {
+            'handlers': ['console'],
+            'level': os.getenv('REQUEST_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 MAX_LENGTH_EMAIL = 254
 MAX_LENGTH_OTHER = 150
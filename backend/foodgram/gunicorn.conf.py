@@ -0,0 +1,21 @@
+import os
+import shutil
+
+from prometheus_client import multiprocess
+
+workers = int(os.getenv('GUNICORN_WORKERS', 3))
+if os.getenv('SERVER_INTERFACE') == 'asgi':
+    worker_class = 'uvicorn.workers.UvicornWorker'
+
+
+def on_starting(server):
+    '''Очистка метрик прошлого запуска.'''
+    directory = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+
+
+def child_exit(server, worker):
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(worker.pid)
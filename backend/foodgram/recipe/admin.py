@@ -1,4 +1,7 @@
 from django.contrib import admin
+from django.contrib.postgres.search import SearchQuery
+from django.db import connection
+from django.db.models import Q
 
 from .models import (Favorite, Ingredient, IngredientAmount, Recipe,
                      ShoppingCart, Tag)
@@ -23,6 +26,17 @@ class RecipeAdmin(admin.ModelAdmin):
     list_per_page = 25
     save_on_top = True
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term or connection.vendor != 'postgresql':
+            return super().get_search_results(request, queryset,
+                                              search_term)
+        search_query = SearchQuery(search_term, config='russian',
+                                   search_type='websearch')
+        return queryset.filter(
+            Q(search_vector=search_query)
+            | Q(author__username__icontains=search_term)
+        ), False
+
 
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
@@ -0,0 +1,26 @@
+from django.db import models
+
+
+class PostgresOnlyIndexMixin:
+    '''Индекс создается только в PostgreSQL.
+
+    На других СУБД (SQLite для разработки) миграция выполняет
+    комментарий вместо CREATE INDEX, а индекс остается в состоянии
+    моделей, чтобы makemigrations не видел расхождений.
+    '''
+    def create_sql(self, model, schema_editor, *args, **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return self.skipped_sql()
+        return super().create_sql(model, schema_editor, *args, **kwargs)
+
+    def remove_sql(self, model, schema_editor, *args, **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return self.skipped_sql()
+        return super().remove_sql(model, schema_editor, *args, **kwargs)
+
+    def skipped_sql(self):
+        return f'-- {self.name}: индекс только для PostgreSQL'
+
+
+class PostgresOnlyIndex(PostgresOnlyIndexMixin, models.Index):
+    pass
@@ -1,29 +1,137 @@
 import csv
+import json
 import os
+import re
+from collections import Counter
+from contextlib import nullcontext
+from itertools import islice
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
-from django.db import IntegrityError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 from recipe.models import Ingredient
 
+JSON_SEPARATOR = re.compile(r'\s*,?\s*')
+NAME_LENGTH = Ingredient._meta.get_field('name').max_length
+UNIT_LENGTH = Ingredient._meta.get_field('measurement_unit').max_length
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if row == ['name', 'measurement_unit']:
+            continue
+        yield row if len(row) == 2 else None
+
+
+def read_json(file, chunk_size=64 * 1024):
+    '''Элементы JSON-массива по одному, без чтения файла целиком.'''
+    decoder = json.JSONDecoder()
+    buffer = file.read(chunk_size).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Ожидается JSON-массив ингредиентов.')
+    position, eof = 1, False
+    while True:
+        position = JSON_SEPARATOR.match(buffer, position).end()
+        if buffer.startswith(']', position):
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise CommandError('Файл JSON поврежден или обрезан.')
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        if isinstance(item, dict):
+            yield [item.get('name'), item.get('measurement_unit')]
+        else:
+            yield None
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+}
+
+
+def clean(row):
+    '''Пара (название, единица) или None для некорректной строки.'''
+    if row is None or not all(isinstance(value, str) for value in row):
+        return None
+    name, measurement_unit = (value.strip() for value in row)
+    if (not name or not measurement_unit or len(name) > NAME_LENGTH
+            or len(measurement_unit) > UNIT_LENGTH):
+        return None
+    return name, measurement_unit
+
 
 class Command(BaseCommand):
     '''Загрузка ингредиентов в БД.'''
+    help = ('Идемпотентная загрузка ингредиентов из CSV или JSON '
+            'пачками: существующие ингредиенты пропускаются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            default=os.path.join(settings.BASE_DIR, 'data',
+                                 'ingredients.csv'),
+        )
+        parser.add_argument('--format', choices=READERS, default=None,
+                            help='По умолчанию определяется по расширению.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--progress', type=int, default=100000,
+                            help='Сообщать о ходе загрузки каждые N строк.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Посчитать изменения и откатить их.')
+
     def handle(self, *args, **options):
-        csv_file_path = os.path.join(settings.BASE_DIR,
-                                     'data', 'ingredients.csv')
-        with open(
-            csv_file_path,
-            'r',
-            encoding='utf-8'
-        ) as csv_file:
-            reader = csv.DictReader(csv_file, fieldnames=['name',
-                                                          'measurement_unit'])
-            try:
-                Ingredient.objects.bulk_create(
-                    Ingredient(**items) for items in reader
-                )
-            except IntegrityError:
-                return 'Такие ингредиенты уже есть...'
+        path = options['path']
+        file_format = (options['format']
+                       or os.path.splitext(path)[1].lstrip('.').lower())
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше 0.')
+        dry_run = options['dry_run']
+        self.counts = Counter()
+        with open(path, encoding='utf-8', newline='') as file, \
+                (transaction.atomic() if dry_run else nullcontext()):
+            rows = READERS[file_format](file)
+            while batch := list(islice(rows, options['batch_size'])):
+                self.import_batch(batch)
+                self.report_progress(len(batch), options['progress'])
+            if dry_run:
+                transaction.set_rollback(True)
         return (
-            f'{Ingredient.objects.count()} - ингредиентов успешно загружено')
+            f'{"Проверка без записи: " if dry_run else ""}'
+            f'добавлено {self.counts["inserted"]}, '
+            f'пропущено существующих {self.counts["skipped"]}, '
+            f'повторов в файле {self.counts["duplicates"]}, '
+            f'некорректных строк {self.counts["invalid"]}.'
+        )
+
+    def import_batch(self, batch):
+        '''Добавляет новые ингредиенты пачки одним запросом.'''
+        valid = [row for row in map(clean, batch) if row is not None]
+        unique = set(valid)
+        self.counts['invalid'] += len(batch) - len(valid)
+        self.counts['duplicates'] += len(valid) - len(unique)
+        existing = set(Ingredient.objects.filter(
+            name__in={name for name, _ in unique}
+        ).values_list('name', 'measurement_unit'))
+        new = unique - existing
+        self.counts['skipped'] += len(unique & existing)
+        self.counts['inserted'] += len(new)
+        Ingredient.objects.bulk_create(
+            (Ingredient(name=name, measurement_unit=measurement_unit)
+             for name, measurement_unit in sorted(new)),
+            ignore_conflicts=True
+        )
+
+    def report_progress(self, batch_size, every):
+        processed = self.counts['processed']
+        self.counts['processed'] += batch_size
+        if self.counts['processed'] // every > processed // every:
+            self.stderr.write(f'Обработано строк: '
+                              f'{self.counts["processed"]}')
@@ -0,0 +1,63 @@
+import json
+import sys
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand
+from recipe.models import Recipe
+
+
+def recipe_to_dict(recipe):
+    '''Рецепт со всеми связанными данными без внутренних id:
+       importrecipes сопоставляет авторов, тэги и ингредиенты
+       по естественным ключам.'''
+    author = recipe.author
+    return {
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'pub_date': recipe.pub_date.isoformat(),
+        'image': recipe.image.name,
+        'thumbnail': recipe.thumbnail.name,
+        'image_webp': recipe.image_webp.name,
+        'author': {
+            'username': author.username,
+            'email': author.email,
+            'first_name': author.first_name,
+            'last_name': author.last_name,
+        },
+        'tags': [
+            {'name': tag.name, 'color': tag.color, 'slug': tag.slug}
+            for tag in recipe.tags.all()
+        ],
+        'ingredients': [
+            {'name': amount.ingredient.name,
+             'measurement_unit': amount.ingredient.measurement_unit,
+             'amount': amount.amount}
+            for amount in recipe.ingredientamount.all()
+        ],
+    }
+
+
+class Command(BaseCommand):
+    '''Выгрузка рецептов в JSON Lines.'''
+    help = ('Выгружает рецепты с авторами, тэгами, ингредиентами и '
+            'ссылками на изображения, по одному рецепту в строке.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-',
+                            help='Файл для выгрузки, по умолчанию stdout.')
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        recipes = Recipe.objects.for_read().order_by('id').iterator(
+            chunk_size=options['chunk_size']
+        )
+        exported = 0
+        with (nullcontext(sys.stdout) if path == '-'
+              else open(path, 'w', encoding='utf-8')) as output:
+            for recipe in recipes:
+                output.write(json.dumps(recipe_to_dict(recipe),
+                                        ensure_ascii=False) + '\n')
+                exported += 1
+        self.stderr.write(f'Выгружено рецептов: {exported}')
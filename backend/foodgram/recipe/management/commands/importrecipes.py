@@ -0,0 +1,181 @@
+import json
+from datetime import datetime
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from recipe.models import Ingredient, IngredientAmount, Recipe, Tag
+from users.models import User
+
+
+def read_lines(file):
+    for line_number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as error:
+            raise CommandError(f'Строка {line_number}: {error}')
+
+
+class Command(BaseCommand):
+    '''Загрузка рецептов из JSON Lines, выгруженных exportrecipes.'''
+    help = ('Загружает рецепты пачками, по транзакции на пачку: '
+            'авторы сопоставляются по username или email, тэги по slug, '
+            'ингредиенты по названию и единице измерения.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше 0.')
+        imported = 0
+        with open(options['path'], encoding='utf-8') as file:
+            lines = read_lines(file)
+            while batch := list(islice(lines, options['batch_size'])):
+                try:
+                    with transaction.atomic():
+                        self.import_batch(batch)
+                except (KeyError, TypeError, ValueError) as error:
+                    raise CommandError(
+                        f'Некорректный рецепт после {imported} '
+                        f'загруженных: {error!r}'
+                    )
+                imported += len(batch)
+                self.stderr.write(f'Загружено рецептов: {imported}')
+        return f'Загружено рецептов: {imported}.'
+
+    def import_batch(self, batch):
+        authors = self.resolve_authors(data['author'] for data in batch)
+        tags = self.resolve_tags(
+            tag for data in batch for tag in data['tags']
+        )
+        ingredients = self.resolve_ingredients(
+            ingredient for data in batch for ingredient in data['ingredients']
+        )
+        recipes = Recipe.objects.bulk_create(
+            Recipe(author=authors[data['author']['username']],
+                   name=data['name'], text=data['text'],
+                   cooking_time=data['cooking_time'],
+                   image=data['image'],
+                   thumbnail=data.get('thumbnail', ''),
+                   image_webp=data.get('image_webp', ''),
+                   ingredients_count=len(data['ingredients']))
+            for data in batch
+        )
+        for recipe, data in zip(recipes, batch):
+            recipe.pub_date = datetime.fromisoformat(data['pub_date'])
+        Recipe.objects.bulk_update(recipes, ('pub_date',))
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tags[tag['slug']])
+            for recipe, data in zip(recipes, batch) for tag in data['tags']
+        )
+        IngredientAmount.objects.bulk_create(
+            IngredientAmount(
+                recipe=recipe,
+                ingredient=ingredients[(ingredient['name'],
+                                        ingredient['measurement_unit'])],
+                amount=ingredient['amount'],
+            )
+            for recipe, data in zip(recipes, batch)
+            for ingredient in data['ingredients']
+        )
+        if connection.vendor == 'postgresql':
+            Recipe.objects.filter(
+                pk__in=[recipe.pk for recipe in recipes]
+            ).update_search_vector()
+
+    @staticmethod
+    def resolve_authors(authors):
+        '''Пользователи по username; новые создаются без пароля.'''
+        authors = {author['username']: author for author in authors}
+        existing = list(User.objects.filter(
+            Q(username__in=authors)
+            | Q(email__in=[author['email'] for author in authors.values()])
+        ))
+        by_username = {user.username: user for user in existing}
+        by_email = {user.email: user for user in existing}
+        resolved = {}
+        missing = []
+        for username, author in authors.items():
+            user = by_username.get(username) or by_email.get(author['email'])
+            if user is None:
+                user = User(username=username, email=author['email'],
+                            first_name=author.get('first_name', ''),
+                            last_name=author.get('last_name', ''),
+                            password=make_password(None))
+                missing.append(user)
+            resolved[username] = user
+        User.objects.bulk_create(missing)
+        return resolved
+
+    def resolve_tags(self, tags):
+        '''Тэги по slug; новые создаются по одному, чтобы сработали
+           сигналы сброса кеша тэгов. Название и цвет тэга тоже
+           уникальны: совпадение с другим тэгом прерывает загрузку
+           с перечнем конфликтов.'''
+        tags = {tag['slug']: tag for tag in tags}
+        resolved = Tag.objects.in_bulk(tags, field_name='slug')
+        for slug, tag in resolved.items():
+            if (tag.name, tag.color) != (tags[slug]['name'],
+                                         tags[slug]['color']):
+                self.stderr.write(
+                    f'Тэг {slug} уже есть как {tag.name} {tag.color}, '
+                    f'в файле {tags[slug]["name"]} {tags[slug]["color"]}: '
+                    'используется существующий.'
+                )
+        missing = {slug: tag for slug, tag in tags.items()
+                   if slug not in resolved}
+        conflicts = []
+        for field in ('name', 'color'):
+            owners = self.tag_owners(missing, field)
+            for slug, tag in missing.items():
+                if owners[tag[field]] != slug:
+                    conflicts.append(f'{slug}: {field} {tag[field]!r} '
+                                     f'занято тэгом {owners[tag[field]]}')
+        if conflicts:
+            raise CommandError(
+                'Тэги конфликтуют с существующими: ' + '; '.join(conflicts)
+            )
+        for slug, tag in missing.items():
+            resolved[slug] = Tag.objects.create(
+                name=tag['name'], color=tag['color'], slug=slug
+            )
+        return resolved
+
+    @staticmethod
+    def tag_owners(tags, field):
+        '''Занятые значения поля: из базы и от первых тэгов файла.'''
+        owners = dict(Tag.objects.filter(
+            **{f'{field}__in': [tag[field] for tag in tags.values()]}
+        ).values_list(field, 'slug'))
+        for slug, tag in tags.items():
+            owners.setdefault(tag[field], slug)
+        return owners
+
+    @staticmethod
+    def resolve_ingredients(ingredients):
+        '''Ингредиенты по паре (название, единица); новые добавляются.'''
+        keys = {(ingredient['name'], ingredient['measurement_unit'])
+                for ingredient in ingredients}
+
+        def existing():
+            return {
+                (ingredient.name, ingredient.measurement_unit): ingredient
+                for ingredient in Ingredient.objects.filter(
+                    name__in={name for name, _ in keys})
+            }
+
+        resolved = existing()
+        if keys - resolved.keys():
+            Ingredient.objects.bulk_create(
+                (Ingredient(name=name, measurement_unit=measurement_unit)
+                 for name, measurement_unit in keys - resolved.keys()),
+                ignore_conflicts=True
+            )
+            resolved = existing()
+        return resolved
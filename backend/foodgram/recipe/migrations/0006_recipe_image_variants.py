@@ -0,0 +1,23 @@
+# Generated by Django 4.2.3 on 2026-10-18 05:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0005_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_webp',
+            field=models.ImageField(blank=True, upload_to='media/webp/', verbose_name='Изображение рецепта (WebP)'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='thumbnail',
+            field=models.ImageField(blank=True, upload_to='media/thumbnails/', verbose_name='Миниатюра изображения (WebP)'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 4.2.3 on 2026-10-18 05:38
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.functions.text
+import recipe.indexes
+
+
+def remove_duplicates(apps, schema_editor):
+    removed = {}
+    for model_name in ('Favorite', 'ShoppingCart'):
+        model = apps.get_model('recipe', model_name)
+        keep = model.objects.values('user', 'recipe').annotate(
+            keep_id=models.Min('id')).values('keep_id')
+        removed[model_name], _ = model.objects.exclude(
+            id__in=keep).delete()
+    if removed['ShoppingCart']:
+        refill_shopping_lists(apps)
+
+
+def refill_shopping_lists(apps):
+    IngredientAmount = apps.get_model('recipe', 'IngredientAmount')
+    ShoppingListItem = apps.get_model('recipe', 'ShoppingListItem')
+    ShoppingListItem.objects.all().delete()
+    totals = IngredientAmount.objects.values(
+        'recipe__shoppingcart__user', 'ingredient'
+    ).filter(recipe__shoppingcart__isnull=False).annotate(
+        total=models.Sum('amount')
+    ).order_by()
+    ShoppingListItem.objects.bulk_create(
+        (ShoppingListItem(user_id=row['recipe__shoppingcart__user'],
+                          ingredient_id=row['ingredient'],
+                          amount=row['total'])
+         for row in totals.iterator()),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0006_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=recipe.indexes.PostgresOnlyIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Lower('name'), name='text_pattern_ops'), name='ingredient_name_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ingredientamount',
+            index=models.Index(fields=['recipe', 'ingredient'], name='ingredientamount_recipe_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-name'], name='recipe_name_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='favorite',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_favorite'),
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcart',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_shopping_cart'),
+        ),
+    ]
@@ -1,7 +1,13 @@
 from colorfield.fields import ColorField
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector, SearchVectorField)
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models.functions import Cast, Coalesce, Lower, NullIf, RowNumber
+
+from .indexes import PostgresOnlyIndex
 
 User = get_user_model()
 
@@ -22,6 +28,12 @@ class Ingredient(models.Model):
                 name="unique ingredient name"
             )
         ]
+        indexes = [
+            PostgresOnlyIndex(
+                OpClass(Lower('name'), name='text_pattern_ops'),
+                name='ingredient_name_lower_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -54,6 +66,84 @@ class Tag(models.Model):
         return (f'{self.name} - {self.color}')
 
 
+class RecipeQuerySet(models.QuerySet):
+    '''QuerySet рецептов с данными для чтения без N+1 запросов.'''
+
+    def favorited_by(self, user):
+        return self.filter(models.Exists(Favorite.objects.filter(
+            user=user, recipe=models.OuterRef('pk'))))
+
+    def in_shopping_cart_of(self, user):
+        return self.filter(models.Exists(ShoppingCart.objects.filter(
+            user=user, recipe=models.OuterRef('pk'))))
+
+    def cookable_from(self, ingredient_ids, min_coverage):
+        '''Рецепты, ингредиенты которых не менее чем на min_coverage
+           есть среди ingredient_ids, по убыванию доли покрытия.'''
+        return self.filter(
+            ingredientamount__ingredient__in=ingredient_ids
+        ).annotate(
+            ingredients_available=models.Count('ingredientamount')
+        ).annotate(
+            coverage=Cast('ingredients_available', models.FloatField())
+            / NullIf('ingredients_count', 0)
+        ).filter(coverage__gte=min_coverage).order_by(
+            '-coverage', '-ingredients_available', '-pub_date', '-id'
+        )
+
+    def refresh_ingredients_count(self):
+        '''Пересчитывает сохраненное количество ингредиентов рецептов.'''
+        return self.update(ingredients_count=Coalesce(models.Subquery(
+            IngredientAmount.objects.filter(recipe=models.OuterRef('pk'))
+            .order_by().values('recipe')
+            .annotate(count=models.Count('id')).values('count')
+        ), 0))
+
+    def without_ingredients(self, ingredient_ids):
+        return self.exclude(models.Exists(IngredientAmount.objects.filter(
+            recipe=models.OuterRef('pk'), ingredient__in=ingredient_ids)))
+
+    def latest_per_author(self, limit=None):
+        '''Последние рецепты каждого автора, не более limit на автора.'''
+        queryset = self.order_by('-pub_date', '-id')
+        if limit is None:
+            return queryset
+        return queryset.annotate(
+            author_row=models.Window(
+                expression=RowNumber(),
+                partition_by=models.F('author'),
+                order_by=(models.F('pub_date').desc(),
+                          models.F('id').desc()),
+            )
+        ).filter(author_row__lte=limit)
+
+    def search(self, query):
+        '''Полнотекстовый поиск по названию и описанию с ранжированием.'''
+        search_query = SearchQuery(query, config='russian',
+                                   search_type='websearch')
+        return self.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(models.F('search_vector'), search_query)
+        ).order_by('-search_rank', '-pub_date', '-id')
+
+    def update_search_vector(self):
+        '''Пересчитывает сохраненный поисковый вектор.'''
+        return self.update(
+            search_vector=SearchVector('name', weight='A', config='russian')
+            + SearchVector('text', weight='B', config='russian')
+        )
+
+    def for_read(self):
+        '''Рецепты со всеми связанными данными для сериализации.'''
+        return self.select_related('author').prefetch_related(
+            'tags',
+            models.Prefetch(
+                'ingredientamount',
+                queryset=IngredientAmount.objects.select_related(
+                    'ingredient').order_by('id')
+            )
+        )
+
+
 class Recipe(models.Model):
     '''Модель рецепта.'''
     name = models.CharField(
@@ -88,6 +178,16 @@ class Recipe(models.Model):
         verbose_name='Изображения рецепта',
         upload_to='media/',
     )
+    thumbnail = models.ImageField(
+        verbose_name='Миниатюра изображения (WebP)',
+        upload_to='media/thumbnails/',
+        blank=True,
+    )
+    image_webp = models.ImageField(
+        verbose_name='Изображение рецепта (WebP)',
+        upload_to='media/webp/',
+        blank=True,
+    )
     ingredients = models.ManyToManyField(
         Ingredient,
         verbose_name='Ингридиенты для рецепта',
@@ -98,11 +198,30 @@ class Recipe(models.Model):
         Tag,
         verbose_name='Тэг рецепта',
     )
+    ingredients_count = models.PositiveSmallIntegerField(
+        verbose_name='Количество ингредиентов',
+        default=0,
+        editable=False,
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(fields=('-pub_date', '-id'),
+                         name='recipe_pub_date_id_idx'),
+            models.Index(fields=('-name',), name='recipe_name_idx'),
+            GinIndex(fields=('search_vector',),
+                     name='recipe_search_vector_idx'),
+        ]
 
     def __str__(self):
         return f'{self.author} - {self.name}'
@@ -133,6 +252,12 @@ class Favorite(Abstract):
         verbose_name = 'Избранное'
         verbose_name_plural = 'Избранные рецепты'
         ordering = ('-user',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_favorite'
+            )
+        ]
 
     def __str__(self):
         return f'{self.user.username} add in favorites {self.recipe.name}'
@@ -145,6 +270,12 @@ class ShoppingCart(Abstract):
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Список покупок'
         ordering = ('-user',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_shopping_cart'
+            )
+        ]
 
     def __str__(self):
         return (f'{self.user.username} добавил в список покупок -'
@@ -182,6 +313,48 @@ class IngredientAmount(models.Model):
         verbose_name = 'Количество ингредиентов'
         verbose_name_plural = 'Количество ингредиентов'
         ordering = ('-recipe__name',)
+        indexes = [
+            models.Index(fields=('recipe', 'ingredient'),
+                         name='ingredientamount_recipe_idx'),
+            models.Index(fields=('ingredient', 'recipe'),
+                         name='ingredientamount_ingr_idx'),
+        ]
 
     def __str__(self):
         return f'{self.ingredient} - {self.amount}'
+
+
+class ShoppingListItem(models.Model):
+    '''Суммарное количество ингредиента в корзине покупок пользователя.
+
+    Поддерживается при изменении корзины и ингредиентов рецептов,
+    чтобы выгрузка списка покупок не пересчитывала суммы.
+    '''
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        related_name='shopping_list',
+        on_delete=models.CASCADE
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        verbose_name='Ингредиент',
+        related_name='shopping_list',
+        on_delete=models.CASCADE
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='Количество'
+    )
+
+    class Meta:
+        verbose_name = 'Ингредиент списка покупок'
+        verbose_name_plural = 'Ингредиенты списка покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_list_item'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user} - {self.ingredient} - {self.amount}'